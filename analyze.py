@@ -17,6 +17,13 @@ from loguru import logger
 from models import TelegramMessage, MessageAnalysis, SentimentType
 from config import config, FINANCE_KEYWORDS, TOKEN_ALIASES
 
+# Map FinBERT labels to our sentiment types
+_FINBERT_LABELS = {
+    'positive': SentimentType.BULLISH,
+    'negative': SentimentType.BEARISH,
+    'neutral': SentimentType.NEUTRAL
+}
+
 class MessageAnalyzer:
     """Analyzes Telegram messages for investment relevance and sentiment."""
     
@@ -67,6 +74,20 @@ class MessageAnalyzer:
         )
         
         logger.info("FinBERT model initialized successfully")
+        
+        await self._warmup()
+    
+    async def _warmup(self, iterations: int = 3):
+        """Run a few throwaway inferences so the first real message doesn't pay cold-start costs."""
+        sample = "$BTC price is up after strong volume, looks bullish for the market."
+        for _ in range(iterations):
+            await self._analyze_sentiment(sample)
+        
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+            torch.cuda.empty_cache()
+        
+        logger.info(f"FinBERT warmed up with {iterations} inferences")
     
     async def analyze_message(self, message: TelegramMessage) -> MessageAnalysis:
         """
@@ -186,16 +207,9 @@ class MessageAnalyzer:
             loop = asyncio.get_event_loop()
             results = await loop.run_in_executor(self.executor, run_sentiment)
             
-            # Map FinBERT labels to our sentiment types
-            sentiment_map = {
-                'positive': SentimentType.BULLISH,
-                'negative': SentimentType.BEARISH,
-                'neutral': SentimentType.NEUTRAL
-            }
-            
             # Find the highest confidence prediction
             best_result = max(results, key=lambda x: x['score'])
-            sentiment = sentiment_map.get(best_result['label'].lower(), SentimentType.NEUTRAL)
+            sentiment = _FINBERT_LABELS.get(best_result['label'].lower(), SentimentType.NEUTRAL)
             confidence = best_result['score']
             
             # Apply keyword-based sentiment enhancement for NEUTRAL predictions
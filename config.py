@@ -20,11 +20,20 @@ class Config(BaseSettings):
     # Database configuration
     db_url: str = Field(default="sqlite:///./telegram_analysis.db", description="Database connection URL")
     postgres_password: Optional[str] = Field(default=None, description="PostgreSQL password (used by Docker Compose)")
+    db_pool_min_size: int = Field(default=10, description="Minimum PostgreSQL pool connections")
+    db_pool_max_size: int = Field(default=50, description="Maximum PostgreSQL pool connections")
+    db_command_timeout: float = Field(default=60.0, description="PostgreSQL statement timeout in seconds")
+    db_max_queries: int = Field(default=50000, description="Queries before a pooled connection is recycled")
+    db_max_inactive_lifetime: float = Field(default=300.0, description="Seconds before an idle pooled connection is closed")
+    db_statement_cache_size: int = Field(default=2048, description="Prepared statements cached per connection")
+    db_sqlite_readers: int = Field(default=4, description="SQLite read-only connections used alongside the writer")
     
     # Ingestion settings
     overlap_minutes: int = Field(default=120, description="Minutes to overlap in re-scan")
     batch_size: int = Field(default=100, description="Batch size for message fetching")
+    backfill_queue_size: int = Field(default=4, description="Backfill batches fetched ahead of processing")
     rate_limit_delay: float = Field(default=1.0, description="Delay between API calls in seconds")
+    rate_limit_burst: int = Field(default=3, description="API calls allowed back to back after an idle period")
     
     # Analysis settings
     model_version: int = Field(default=1, description="Analysis model version")
@@ -41,6 +50,9 @@ class Config(BaseSettings):
     ollama_model: str = Field(default="llama3.2:3b", description="Ollama model to use")
     ollama_timeout: int = Field(default=120, description="Ollama request timeout in seconds")
     
+    # Report settings
+    report_cache_ttl: float = Field(default=30.0, description="Seconds to reuse results for identical report requests (0 disables)")
+    
     # Bot settings (optional)
     bot_token: Optional[str] = Field(default=None, description="Telegram bot token for commands")
     admin_user_ids: Optional[str] = Field(default="", description="Admin user IDs (comma-separated)")
@@ -2,6 +2,7 @@
 Message ingestion engine with backfill, checkpointing, and overlap re-scanning.
 """
 import asyncio
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 
@@ -22,6 +23,7 @@ class IngestionEngine:
         self.store = store
         self.chat_id = config.target_chat_id
         self.batch_size = config.batch_size
+        self.backfill_queue_size = config.backfill_queue_size
         self.overlap_minutes = config.overlap_minutes
         self.stats = IngestionStats()
         self._running = False
@@ -40,6 +42,9 @@ class IngestionEngine:
             logger.info("🚀 STARTING TELEGRAM MESSAGE INGESTION ENGINE")
             logger.info("📊 Will process messages with: username extraction + sentiment analysis + token detection")
             
+            # Forward sources are looked up in the background and written back
+            self.tg_client.start_forward_resolver(self._update_forward_source)
+            
             # Step 1: Determine high water mark
             logger.info("Determining high water mark...")
             current_hwm = await self.tg_client.get_current_high_water_mark()
@@ -96,96 +101,95 @@ class IngestionEngine:
         
         logger.info(f"Starting backfill from message_id={start_message_id} to {high_water_mark.message_id}")
         
-        current_id = start_message_id
         total_processed = 0
         
-        while current_id <= high_water_mark.message_id and self._running:
-            try:
-                # Fetch batch of messages
-                max_id = min(current_id + self.batch_size - 1, high_water_mark.message_id)
-                
-                logger.debug(f"Fetching messages {current_id} to {max_id}")
-                messages = await self.tg_client.fetch_messages_batch(
-                    min_id=current_id - 1,  # min_id is exclusive
-                    max_id=max_id,
-                    limit=self.batch_size
-                )
-                
-                if not messages:
-                    logger.debug(f"No messages found in range {current_id}-{max_id}")
-                    current_id = max_id + 1
-                    continue
-                
-                # Process batch and get the last successfully processed message
-                processed_count, last_processed_message = await self._process_message_batch(messages, total_processed)
-                total_processed += processed_count
-                
-                # Update checkpoint only if we successfully processed at least one message
-                if last_processed_message:
-                    checkpoint = IngestCheckpoint(
-                        chat_id=self.chat_id,
-                        last_message_id=last_processed_message.message_id,
-                        last_ts_utc=last_processed_message.ts_utc,
-                        updated_at=datetime.utcnow().replace(tzinfo=timezone.utc)
-                    )
-                    await self.store.update_checkpoint(checkpoint)
-                
-                # Move to next batch
-                if last_processed_message:
-                    current_id = last_processed_message.message_id + 1
-                else:
-                    # If no messages were processed successfully, move to next batch anyway
-                    current_id = max_id + 1
-                
-                # Log progress
-                if total_processed % 100 == 0:
-                    current_msg_id = last_processed_message.message_id if last_processed_message else "unknown"
-                    logger.info(f"Backfill progress: {total_processed} messages processed, current message_id: {current_msg_id}")
+        # Fetching and processing run as two pipeline stages: up to
+        # backfill_queue_size batches are fetched while one is stored and analyzed
+        async with aclosing(self.tg_client.stream_messages(
+            min_id=start_message_id - 1,  # min_id is exclusive
+            max_id=high_water_mark.message_id,
+            batch_size=self.batch_size,
+            prefetch=self.backfill_queue_size
+        )) as batches:
+            async for messages in batches:
+                if not self._running:
+                    break
                 
-            except Exception as e:
-                logger.error(f"Error in backfill batch {current_id}-{max_id}: {e}")
-                # Skip this batch and continue
-                current_id = max_id + 1
-                await asyncio.sleep(5)  # Brief pause before retrying
+                try:
+                    # Process batch and get the last successfully processed message
+                    processed_count, last_processed_message = await self._process_message_batch(messages, total_processed)
+                    total_processed += processed_count
+                    
+                    # Update checkpoint only if we successfully processed at least one message
+                    if last_processed_message:
+                        checkpoint = IngestCheckpoint(
+                            chat_id=self.chat_id,
+                            last_message_id=last_processed_message.message_id,
+                            last_ts_utc=last_processed_message.ts_utc,
+                            updated_at=datetime.utcnow().replace(tzinfo=timezone.utc)
+                        )
+                        await self.store.update_checkpoint(checkpoint)
+                    
+                    # Log progress
+                    if total_processed % 100 == 0:
+                        current_msg_id = last_processed_message.message_id if last_processed_message else "unknown"
+                        logger.info(f"Backfill progress: {total_processed} messages processed, current message_id: {current_msg_id}")
+                    
+                except Exception as e:
+                    logger.error(f"Error in backfill batch {messages[0].message_id}-{messages[-1].message_id}: {e}")
+                    # Skip this batch and continue
+                    await asyncio.sleep(5)  # Brief pause before moving on
         
         logger.info(f"Backfill completed: {total_processed} messages processed")
     
     async def _process_message_batch(self, messages: List[TelegramMessage], global_processed_count: int = 0) -> tuple[int, Optional[TelegramMessage]]:
         """Process a batch of messages (store + analyze). Returns (count, last_successful_message)."""
-        processed_count = 0
+        if not messages:
+            return 0, None
+        
+        # Store the whole batch in one transaction
+        try:
+            await self.store.upsert_messages_batch(messages)
+        except Exception as e:
+            logger.error(f"❌ Error storing batch of {len(messages)} messages: {e}")
+            return 0, None
+        self.tg_client.resolve_stored_forwards([message.message_id for message in messages])
+        self.stats.ingested_messages_total += len(messages)
+        
+        analyses = []
         last_successful_message = None
         
         for message in messages:
             try:
-                # Store message
-                await self.store.upsert_message(message)
-                self.stats.ingested_messages_total += 1
-                
-                # Analyze message
-                analysis = await analyzer.analyze_message(message)
-                await self.store.upsert_analysis(analysis)
-                self.stats.analyzed_messages_total += 1
-                
-                processed_count += 1
-                last_successful_message = message  # Only update if both operations succeeded
+                analyses.append(await analyzer.analyze_message(message))
+                last_successful_message = message
                 
                 # Log progress every 100 messages globally (high-level for backfill)
-                total_so_far = global_processed_count + processed_count
+                total_so_far = global_processed_count + len(analyses)
                 if total_so_far % 100 == 0:
                     logger.info(f"🔄 Batch progress: {total_so_far} messages processed, current message_id: {message.message_id}")
                 
             except Exception as e:
                 logger.error(f"❌ Error processing message {message.message_id}: {e}")
         
-        return processed_count, last_successful_message
+        # Store all analyses in one transaction; the checkpoint only advances
+        # past messages whose analysis was written
+        try:
+            await self.store.upsert_analyses_batch(analyses)
+        except Exception as e:
+            logger.error(f"❌ Error storing analyses for batch of {len(analyses)} messages: {e}")
+            return 0, None
+        self.stats.analyzed_messages_total += len(analyses)
+        
+        return len(analyses), last_successful_message
     
     async def _handle_new_message(self, message: TelegramMessage):
         """Handle a new incoming message."""
         try:
-            # Store and analyze
-            await self.store.upsert_message(message)
+            # Analyze, then store message and analysis together
             analysis = await analyzer.analyze_message(message)
-            await self.store.upsert_analysis(analysis)
+            await self.store.upsert_message_and_analysis(message, analysis)
+            self.tg_client.resolve_stored_forwards([message.message_id])
             
             # Enhanced logging for live messages
             username = message.from_username or "Unknown"
@@ -212,17 +216,19 @@ class IngestionEngine:
         except Exception as e:
             logger.error(f"Error handling new message {message.message_id}: {e}")
     
+    async def _update_forward_source(self, message_id: int, forward_from: Optional[str]) -> bool:
+        """Write a forward source resolved after its message was converted."""
+        return await self.store.update_forward_from(self.chat_id, message_id, forward_from)
+    
     async def _handle_message_edit(self, message: TelegramMessage):
         """Handle a message edit."""
         try:
             logger.debug(f"Message edit received: {message.message_id}")
             
-            # Update message
-            await self.store.upsert_message(message)
-            
-            # Re-analyze
+            # Re-analyze and update message and analysis together
             analysis = await analyzer.analyze_message(message)
-            await self.store.upsert_analysis(analysis)
+            await self.store.upsert_message_and_analysis(message, analysis)
+            self.tg_client.resolve_stored_forwards([message.message_id])
             
         except Exception as e:
             logger.error(f"Error handling message edit {message.message_id}: {e}")
@@ -270,9 +276,11 @@ class IngestionEngine:
             # Check for messages that need re-analysis due to edits
             edited_messages = await self.store.get_messages_needing_reanalysis(self.chat_id)
             
-            for message_id, edit_date in edited_messages:
-                # Fetch the edited message
-                message = await self.tg_client.get_message_by_id(message_id)
+            # Fetch the edited messages
+            refreshed = await self.tg_client.get_messages_by_ids(
+                [message_id for message_id, _ in edited_messages]
+            )
+            for message in refreshed:
                 if message:
                     analysis = await analyzer.analyze_message(message)
                     await self.store.upsert_analysis(analysis)
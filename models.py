@@ -66,6 +66,12 @@ class IngestCheckpoint(BaseModel):
         }
 
 
+class MessageCursor(BaseModel):
+    """Position of a scan through a chat's history."""
+    message_id: int = 0
+    ts_utc: Optional[datetime] = None
+
+
 class HighWaterMark(BaseModel):
     """High water mark for backfill boundary."""
     chat_id: int
@@ -2,16 +2,47 @@
 Report generation for Telegram analysis data.
 """
 import csv
+import gzip
 import io
+import re
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import tempfile
 import os
+import time
+from collections import Counter
+from itertools import islice
 
 from loguru import logger
 
 from models import ReportRequest, ReportResult, SentimentType
 from store import DatabaseStore
+from config import config
+
+__all__ = ['ReportGenerator']
+
+# Distinct report requests whose results are kept for reuse
+_REPORT_CACHE_SIZE = 64
+
+# Key points kept per sentiment bucket for each token
+_MAX_POINTS_PER_SENTIMENT = 4
+
+_SENTIMENT_EMOJI = {"BULLISH": "🟢", "BEARISH": "🔴", "NEUTRAL": "⚪"}
+_SENTIMENT_EMOJI_DEFAULT = "⚪"
+
+# Command argument parsers: optional "topic:"/"limit:" prefix, payload in group 1
+_TOPIC_RE = re.compile(r'^\s*(?:topic:)?\s*\$?(.*?)\s*\Z', re.IGNORECASE | re.DOTALL)
+_LIMIT_RE = re.compile(r'^\s*(?:limit:)?(.*)\Z', re.IGNORECASE | re.DOTALL)
+
+_CSV_FIELDNAMES = (
+    'message_id', 'timestamp', 'username', 'text', 'is_investment',
+    'sentiment', 'tokens', 'topic_key', 'key_points'
+)
+
+
+def _count_tokens(messages: List[Dict[str, Any]]) -> Counter:
+    """Tally token mentions across report messages."""
+    return Counter(t for m in messages if m.get('tokens') for t in m['tokens'] if t)
 
 
 class ReportGenerator:
@@ -19,20 +50,43 @@ class ReportGenerator:
     
     def __init__(self, store: DatabaseStore):
         self.store = store
+        self._cache_ttl = config.report_cache_ttl
+        self._report_cache: Dict[tuple, Tuple[float, ReportResult]] = {}
     
     async def generate_report(self, request: ReportRequest) -> ReportResult:
         """Generate a comprehensive report based on the request parameters."""
+        # Widen the window to whole minutes so relative ranges ("24h") asked
+        # for within the same minute share a cache entry
+        start_date = request.start_date.replace(second=0, microsecond=0)
+        end_date = request.end_date.replace(second=0, microsecond=0)
+        if end_date != request.end_date:
+            end_date += timedelta(minutes=1)
+        
+        cache_key = (start_date, end_date, request.chat_id,
+                     request.topic_filter, request.limit)
+        cached = self._report_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self._cache_ttl:
+            logger.debug(f"Serving cached report: {request.start_date} to {request.end_date}")
+            return cached[1]
+        
         logger.info(f"Generating report: {request.start_date} to {request.end_date}")
         
         result = await self.store.generate_report(
-            start_date=request.start_date,
-            end_date=request.end_date,
+            start_date=start_date,
+            end_date=end_date,
             chat_id=request.chat_id,
             topic_filter=request.topic_filter,
             limit=request.limit
         )
         
         logger.info(f"Report generated: {result.total_messages} messages, {result.investment_messages} investment-related")
+        
+        if self._cache_ttl > 0:
+            self._report_cache.pop(cache_key, None)
+            if len(self._report_cache) >= _REPORT_CACHE_SIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del self._report_cache[next(iter(self._report_cache))]
+            self._report_cache[cache_key] = (time.monotonic(), result)
         return result
     
     def format_report_markdown(self, result: ReportResult, 
@@ -48,18 +102,22 @@ class ReportGenerator:
         header += "\n"
         
         # Summary stats
-        investment_pct = (result.investment_messages / result.total_messages * 100) if result.total_messages > 0 else 0
-        
+        total = result.total_messages
+        investment_pct = result.investment_messages * (100.0 / total) if total else 0.0
+
         summary = f"**📈 Summary**\n"
         summary += f"• Total Messages: {result.total_messages:,}\n"
         summary += f"• Investment-Related: {result.investment_messages:,} ({investment_pct:.1f}%)\n\n"
         
         # Sentiment breakdown
         sentiment_section = "**💭 Sentiment Analysis**\n"
-        if result.investment_messages > 0:
+        inv = result.investment_messages
+        if inv > 0:
+            # One division for the whole breakdown; each row is then a multiply
+            scale = 100.0 / inv
             for sentiment, count in result.sentiment_breakdown.items():
-                pct = (count / result.investment_messages * 100) if result.investment_messages > 0 else 0
-                emoji = {"BULLISH": "🟢", "BEARISH": "🔴", "NEUTRAL": "⚪"}.get(sentiment.value, "⚪")
+                pct = count * scale
+                emoji = _SENTIMENT_EMOJI.get(sentiment.value, _SENTIMENT_EMOJI_DEFAULT)
                 sentiment_section += f"• {emoji} {sentiment.value}: {count:,} ({pct:.1f}%)\n"
         else:
             sentiment_section += "• No investment messages found\n"
@@ -67,8 +125,9 @@ class ReportGenerator:
         
         # Top tokens
         tokens_section = "**🪙 Top Tokens**\n"
-        if result.top_tokens:
-            for i, (token, count) in enumerate(result.top_tokens[:5], 1):
+        top_tokens = result.top_tokens[:5] or _count_tokens(result.messages).most_common(5)
+        if top_tokens:
+            for i, (token, count) in enumerate(top_tokens, 1):
                 tokens_section += f"{i}. ${token}: {count:,} mentions\n"
         else:
             tokens_section += "• No tokens found\n"
@@ -85,7 +144,7 @@ class ReportGenerator:
                 
                 sentiment_emoji = ""
                 if msg.get('sentiment'):
-                    sentiment_emoji = {"BULLISH": "🟢", "BEARISH": "🔴", "NEUTRAL": "⚪"}.get(msg['sentiment'], "")
+                    sentiment_emoji = _SENTIMENT_EMOJI.get(msg['sentiment'], "")
                 
                 tokens_str = ""
                 if msg.get('tokens'):
@@ -116,78 +175,69 @@ class ReportGenerator:
         if not token_data:
             return header + summary + "No investment-related tokens found in this period.\n"
         
-        # Format tokens in clean BULLISH/BEARISH sections
-        token_list = ""
+        # Format tokens in clean BULLISH/BEARISH sections; rows are collected
+        # and joined once rather than growing one string per line
+        rows = []
         for i, (token, data) in enumerate(token_data.items(), 1):
             # Get contributors (limit to 8 for readability)
-            valid_contributors = [str(c) for c in data['contributors'][:8] if c is not None]
-            contributors = ", ".join(valid_contributors)
-            if len(data['contributors']) > 8:
-                contributors += f" +{len(data['contributors']) - 8} more"
-            
-            # Count mentions
-            mention_count = data['message_count']
+            all_contributors = data['contributors']
+            contributors = ", ".join(str(c) for c in all_contributors[:8] if c is not None)
+            if len(all_contributors) > 8:
+                contributors += f" +{len(all_contributors) - 8} more"
             
             # Add token header
-            token_list += f"{i}. {token} ({mention_count} mentions)\n"
-            token_list += f"👥 Contributors: {contributors}\n\n"
-            
-            # Add BULLISH section
-            if data['bullish_points']:
-                token_list += "📈 BULLISH:\n"
-                for point in data['bullish_points'][:4]:
-                    if point and str(point).strip():
-                        token_list += f"• {str(point).strip()}\n"
-                token_list += "\n"
+            rows.append(f"{i}. {token} ({data['message_count']} mentions)\n"
+                        f"👥 Contributors: {contributors}\n\n")
             
-            # Add BEARISH section
-            if data['bearish_points']:
-                token_list += "📉 BEARISH:\n"
-                for point in data['bearish_points'][:4]:
-                    if point and str(point).strip():
-                        token_list += f"• {str(point).strip()}\n"
-                token_list += "\n"
+            # Add BULLISH / BEARISH sections
+            for heading, points in (("📈 BULLISH:\n", data['bullish_points']),
+                                    ("📉 BEARISH:\n", data['bearish_points'])):
+                if not points:
+                    continue
+                rows.append(heading)
+                for point in points[:_MAX_POINTS_PER_SENTIMENT]:
+                    point = str(point).strip() if point else ""
+                    if point:
+                        rows.append(f"• {point}\n")
+                rows.append("\n")
             
             # If no sentiment points, show neutral
             if not data['bullish_points'] and not data['bearish_points']:
-                token_list += "⚪ No significant directional sentiment detected\n\n"
+                rows.append("⚪ No significant directional sentiment detected\n\n")
             
-            token_list += "\n"
+            rows.append("\n")
         
+        token_list = "".join(rows)
         return header + summary + token_list
     
     def _group_messages_by_token(self, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         """Group messages by token and aggregate data."""
         token_data = {}
-        
-        for msg in messages:
-            # Skip non-investment messages
-            if not msg.get('is_investment'):
-                continue
-                
-            tokens = msg.get('tokens', [])
-            if not tokens:
-                continue
-                
-            username = msg.get('from_username') or 'Unknown'  # Handle None usernames
-            sentiment = msg.get('sentiment', 'NEUTRAL')
-            # Handle both string and enum types
-            if hasattr(sentiment, 'value'):
-                sentiment_str = sentiment.value
-            else:
-                sentiment_str = str(sentiment) if sentiment else 'NEUTRAL'
-            
-                
-            key_points = msg.get('key_points', [])
-            
+        mentions = Counter()
+
+        def _relevant():
+            # Only investment messages that mention tokens contribute to the table
+            for msg in messages:
+                if not (msg.get('is_investment') and msg.get('tokens')):
+                    continue
+                sentiment = msg.get('sentiment') or 'NEUTRAL'
+                # Handle both string and enum types
+                sentiment_str = sentiment.value if hasattr(sentiment, 'value') else str(sentiment)
+                key_points = msg.get('key_points') or []
+                valid_key_points = [point for point in key_points[:2] if point and str(point).strip()]
+                yield (msg['tokens'], msg.get('from_username') or 'Unknown',
+                       sentiment_str, valid_key_points)
+
+        for tokens, username, sentiment_str, valid_key_points in _relevant():
             for token in tokens:
                 if not token:  # Skip None/empty tokens
                     continue
-                    
+
                 token_key = f"${token}"
-                
-                if token_key not in token_data:
-                    token_data[token_key] = {
+
+                entry = token_data.get(token_key)
+                if entry is None:
+                    entry = token_data[token_key] = {
                         'contributors': set(),
                         'bullish_points': [],
                         'bearish_points': [],
@@ -197,50 +247,59 @@ class ReportGenerator:
                         'bearish_count': 0,
                         'neutral_count': 0
                     }
-                
-                token_data[token_key]['contributors'].add(username)
-                token_data[token_key]['message_count'] += 1
-                
+
+                entry['contributors'].add(username)
+                mentions[token_key] += 1
+
                 # Count sentiment occurrences and categorize key points
-                valid_key_points = [point for point in key_points[:2] if point and str(point).strip()]
                 if sentiment_str == 'BULLISH':
-                    token_data[token_key]['bullish_count'] += 1
-                    token_data[token_key]['bullish_points'].extend(valid_key_points)
+                    entry['bullish_count'] += 1
+                    points = entry['bullish_points']
                 elif sentiment_str == 'BEARISH':
-                    token_data[token_key]['bearish_count'] += 1
-                    token_data[token_key]['bearish_points'].extend(valid_key_points)
+                    entry['bearish_count'] += 1
+                    points = entry['bearish_points']
                 else:
-                    token_data[token_key]['neutral_count'] += 1
-                    token_data[token_key]['neutral_points'].extend(valid_key_points)
-        
-        # Convert sets to sorted lists and limit points
-        for token_key in token_data:
-            token_data[token_key]['contributors'] = sorted(list(token_data[token_key]['contributors']))
-            # Limit to top points to avoid overwhelming output
-            token_data[token_key]['bullish_points'] = token_data[token_key]['bullish_points'][:4]
-            token_data[token_key]['bearish_points'] = token_data[token_key]['bearish_points'][:4]
-        
-        # Sort by message count (most discussed tokens first)
-        return dict(sorted(token_data.items(), 
-                          key=lambda x: x[1]['message_count'], 
-                          reverse=True))
+                    entry['neutral_count'] += 1
+                    points = entry['neutral_points']
+                # Keep only the first few points to avoid overwhelming output
+                if len(points) < _MAX_POINTS_PER_SENTIMENT:
+                    points.extend(islice(valid_key_points, _MAX_POINTS_PER_SENTIMENT - len(points)))
+
+        # Convert sets to sorted lists, most discussed tokens first
+        ranked = {}
+        for token_key, count in mentions.most_common():
+            entry = token_data[token_key]
+            entry['message_count'] = count
+            entry['contributors'] = sorted(entry['contributors'])
+            ranked[token_key] = entry
+        return ranked
     
     async def export_to_csv(self, result: ReportResult, 
-                          start_date: datetime, end_date: datetime) -> str:
-        """Export report results to CSV and return file path."""
+                          start_date: datetime, end_date: datetime,
+                          compress: bool = True) -> str:
+        """
+        Export report results to CSV and return file path.
+        
+        With ``compress`` the file is written as ``.csv.gz``; message text is
+        the bulk of each row and repetitive usernames/tickers compress well.
+        """
         
         # Create temporary file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"telegram_analysis_{timestamp}.csv"
+        if compress:
+            filename += ".gz"
         filepath = os.path.join(tempfile.gettempdir(), filename)
         
         try:
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'message_id', 'timestamp', 'username', 'text', 'is_investment',
-                    'sentiment', 'tokens', 'topic_key', 'key_points'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            if compress:
+                # Level 1 keeps gzip cheap relative to the disk/network it saves
+                csv_file = gzip.open(filepath, 'wt', compresslevel=1, encoding='utf-8', newline='')
+            else:
+                csv_file = open(filepath, 'w', newline='', encoding='utf-8')
+            
+            with csv_file as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=_CSV_FIELDNAMES)
                 
                 # Write header
                 writer.writeheader()
@@ -298,23 +357,23 @@ class ReportGenerator:
         # Date range with "to"
         if " to " in date_str:
             start_str, end_str = date_str.split(" to ")
-            start_date = self._parse_single_date(start_str.strip())
-            end_date = self._parse_single_date(end_str.strip())
+            start_date = self._parse_single_date(start_str.strip(), now=now)
+            end_date = self._parse_single_date(end_str.strip(), now=now)
             # Make end_date end of day
             end_date = end_date.replace(hour=23, minute=59, second=59)
             return start_date, end_date
         
         # Single date (assume full day)
         try:
-            single_date = self._parse_single_date(date_str)
+            single_date = self._parse_single_date(date_str, now=now)
             start_date = single_date.replace(hour=0, minute=0, second=0)
             end_date = single_date.replace(hour=23, minute=59, second=59)
             return start_date, end_date
         except:
             raise ValueError(f"Unable to parse date range: {date_str}")
     
-    def _parse_single_date(self, date_str: str) -> datetime:
-        """Parse a single date string."""
+    def _parse_single_date(self, date_str: str, now: Optional[datetime] = None) -> datetime:
+        """Parse a single date string. Year-less formats take the year from ``now``."""
         date_str = date_str.strip()
         
         # Try various formats
@@ -333,7 +392,9 @@ class ReportGenerator:
                 parsed = datetime.strptime(date_str, fmt)
                 # If no year specified, use current year
                 if fmt in ["%m-%d", "%m/%d"]:
-                    parsed = parsed.replace(year=datetime.now().year)
+                    if now is None:
+                        now = datetime.utcnow()
+                    parsed = parsed.replace(year=now.year)
                 return parsed
             except ValueError:
                 continue
@@ -341,35 +402,23 @@ class ReportGenerator:
         raise ValueError(f"Unable to parse date: {date_str}")
     
     def parse_topic_filter(self, filter_str: str) -> Optional[str]:
-        """Parse topic filter from command."""
+        """Parse topic filter from command (optional "topic:" and "$" prefixes)."""
         if not filter_str:
             return None
         
-        filter_str = filter_str.strip()
-        
-        # Remove "topic:" prefix if present
-        if filter_str.lower().startswith("topic:"):
-            filter_str = filter_str[6:].strip()
-        
-        # Remove $ prefix if present
-        if filter_str.startswith("$"):
-            filter_str = filter_str[1:]
-        
-        return filter_str.upper() if filter_str else None
+        match = _TOPIC_RE.match(filter_str)
+        if not match:
+            return None
+        return match.group(1).upper() or None
     
     def parse_limit(self, limit_str: str) -> Optional[int]:
-        """Parse limit from command."""
+        """Parse limit from command (optional "limit:" prefix)."""
         if not limit_str:
             return None
         
-        limit_str = limit_str.strip()
-        
-        # Remove "limit:" prefix if present
-        if limit_str.lower().startswith("limit:"):
-            limit_str = limit_str[6:].strip()
-        
+        # int() handles the payload so "1_000" and the like keep parsing
         try:
-            limit = int(limit_str)
-            return max(1, min(limit, 10000))  # Clamp between 1 and 10000
+            limit = int(_LIMIT_RE.match(limit_str).group(1))
         except ValueError:
             return None
+        return min(max(limit, 1), 10000)  # Clamp between 1 and 10000
@@ -6,17 +6,15 @@ import sys
 from datetime import datetime, timedelta
 
 from config import config
-from store import DatabaseStore
+from store import DatabaseStore, MessageStagingBuffer, get_store
 from tg_client import TelegramClientWrapper
 
 
-async def test_database_connection():
+async def test_database_connection(store: DatabaseStore):
     """Test database connection and schema creation."""
     print("🔍 Testing database connection...")
     
     try:
-        store = DatabaseStore()
-        await store.initialize()
         print("✅ Database connection successful")
         
         # Test basic operations
@@ -34,8 +32,6 @@ async def test_database_connection():
             print("✅ Database operations working")
         else:
             print("❌ Database operations failed")
-            
-        await store.close()
         
     except Exception as e:
         print(f"❌ Database test failed: {e}")
@@ -44,12 +40,11 @@ async def test_database_connection():
     return True
 
 
-async def test_telegram_connection():
+async def test_telegram_connection(client: TelegramClientWrapper):
     """Test Telegram client connection and chat access."""
     print("🔍 Testing Telegram connection...")
     
     try:
-        client = TelegramClientWrapper()
         await client.initialize()
         
         success, message = await client.validate_chat_access()
@@ -57,15 +52,12 @@ async def test_telegram_connection():
             print(f"✅ Telegram connection successful: {message}")
         else:
             print(f"❌ Telegram connection failed: {message}")
-            await client.disconnect()
             return False
         
         # Test fetching a few messages
         hwm = await client.get_current_high_water_mark()
         print(f"✅ High water mark: message_id={hwm.message_id}, ts={hwm.ts_utc}")
         
-        await client.disconnect()
-        
     except Exception as e:
         print(f"❌ Telegram test failed: {e}")
         return False
@@ -73,12 +65,11 @@ async def test_telegram_connection():
     return True
 
 
-async def test_analysis_pipeline():
+async def test_analysis_pipeline(analyzer):
     """Test the analysis pipeline."""
     print("🔍 Testing analysis pipeline...")
     
     try:
-        from analyze import analyzer
         from models import TelegramMessage
         
         await analyzer.initialize()
@@ -107,8 +98,6 @@ async def test_analysis_pipeline():
         print(f"   - Topic: {analysis.topic_key}")
         print(f"   - Confidence: {analysis.confidence}")
         
-        await analyzer.close()
-        
     except Exception as e:
         print(f"❌ Analysis test failed: {e}")
         return False
@@ -134,22 +123,37 @@ async def run_diagnostics():
         print("❌ Missing required Telegram credentials. Please check your .env file.")
         return False
     
+    from analyze import analyzer
+    
+    # Create shared components once and reuse them across all tests
+    try:
+        store = await get_store()
+    except Exception as e:
+        print(f"❌ Database initialization failed: {e}")
+        return False
+    client = TelegramClientWrapper()
+    
     # Test components
     tests = [
-        ("Database", test_database_connection),
-        ("Telegram", test_telegram_connection),
-        ("Analysis", test_analysis_pipeline),
+        ("Database", test_database_connection, store),
+        ("Telegram", test_telegram_connection, client),
+        ("Analysis", test_analysis_pipeline, analyzer),
     ]
     
     results = []
-    for test_name, test_func in tests:
-        print(f"\n🧪 Testing {test_name}...")
-        try:
-            result = await test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} test crashed: {e}")
-            results.append((test_name, False))
+    try:
+        for test_name, test_func, component in tests:
+            print(f"\n🧪 Testing {test_name}...")
+            try:
+                result = await test_func(component)
+                results.append((test_name, result))
+            except Exception as e:
+                print(f"❌ {test_name} test crashed: {e}")
+                results.append((test_name, False))
+    finally:
+        await client.disconnect()
+        await analyzer.close()
+        await store.close()
     
     # Summary
     print("\n" + "=" * 50)
@@ -179,8 +183,7 @@ async def create_sample_data():
         from models import TelegramMessage, MessageAnalysis, SentimentType
         from analyze import analyzer
         
-        store = DatabaseStore()
-        await store.initialize()
+        store = await get_store()
         await analyzer.initialize()
         
         # Sample messages
@@ -215,9 +218,8 @@ async def create_sample_data():
         chat_id = config.target_chat_id
         base_time = datetime.utcnow()
         
-        for i, sample in enumerate(sample_messages):
-            # Create message
-            message = TelegramMessage(
+        messages = [
+            TelegramMessage(
                 chat_id=chat_id,
                 message_id=i + 1,
                 ts_utc=base_time - timedelta(hours=i),
@@ -229,15 +231,30 @@ async def create_sample_data():
                 forward_from=None,
                 reply_to_id=None
             )
-            
-            # Store message
-            await store.upsert_message(message)
-            
-            # Analyze and store analysis
-            analysis = await analyzer.analyze_message(message)
-            await store.upsert_analysis(analysis)
-            
-            print(f"   ✅ Created sample message {i + 1}: {sample['text'][:50]}...")
+            for i, sample in enumerate(sample_messages)
+        ]
+        
+        # Stage messages column-wise and store them in one batch
+        buffer = MessageStagingBuffer()
+        buffer.extend(messages)
+        
+        # FinBERT runs in the analyzer's thread pool, so analyses can proceed
+        # while the message batch is being written
+        semaphore = asyncio.Semaphore(8)
+        
+        async def analyze_one(i, message):
+            async with semaphore:
+                analysis = await analyzer.analyze_message(message)
+            print(f"   ✅ Created sample message {i + 1}: {message.text[:50]}...")
+            return analysis
+        
+        _, analyses = await asyncio.gather(
+            store.flush_messages(buffer),
+            asyncio.gather(*(analyze_one(i, message) for i, message in enumerate(messages)))
+        )
+        
+        # Store analyses in one batch once their messages exist
+        await store.upsert_analyses_batch(analyses)
         
         print(f"✅ Created {len(sample_messages)} sample messages")
         
@@ -3,13 +3,15 @@ Database store for Telegram messages and analysis.
 Supports both PostgreSQL and SQLite.
 """
 import asyncio
-import json
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import List, Optional, Tuple, Dict, Any
 from urllib.parse import urlparse
 
 import asyncpg
 import aiosqlite
+import orjson
 from loguru import logger
 
 from models import (
@@ -19,49 +21,481 @@ from models import (
 from config import config
 
 
+# SQLite stores timestamps as INTEGER milliseconds since the Unix epoch (UTC),
+# so range filters and comparisons are plain integer compares.
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_SQLITE_NOW_MS = "(CAST(strftime('%s', 'now') AS INTEGER) * 1000)"
+
+
+def _to_epoch_ms(dt: Optional[datetime]) -> Optional[int]:
+    """Convert a datetime to epoch milliseconds; naive values are taken as UTC."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _from_epoch_ms(ms: int) -> datetime:
+    """Convert epoch milliseconds back to an aware UTC datetime."""
+    return _EPOCH + timedelta(milliseconds=ms)
+
+
+def _json_list(value: Optional[str]) -> List[Any]:
+    """Decode a JSON array column, treating empty or malformed values as []."""
+    if not value:
+        return []
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return []
+
+
+def _iso_to_ms_sql(column: str) -> str:
+    """SQL expression turning an ISO-8601 text column into epoch milliseconds."""
+    # julianday() honours a trailing UTC offset and treats naive values as UTC
+    return f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+# Column lists and conversions used to copy rows out of SQLite tables created
+# before timestamps were stored as epoch milliseconds.
+_SQLITE_LEGACY_COPY = {
+    'messages': (
+        "chat_id, message_id, ts_utc, from_user_id, from_username, is_forwarded, "
+        "forward_from, text, urls, reply_to_id, edit_date, created_at",
+        f"chat_id, message_id, {_iso_to_ms_sql('ts_utc')}, from_user_id, from_username, "
+        f"is_forwarded, forward_from, text, urls, reply_to_id, "
+        f"{_iso_to_ms_sql('edit_date')}, {_iso_to_ms_sql('created_at')}"
+    ),
+    'analysis': (
+        "chat_id, message_id, is_investment, sentiment, tokens, topic_key, "
+        "key_points, confidence, model_version, analyzed_at",
+        "chat_id, message_id, is_investment, sentiment, tokens, topic_key, "
+        f"key_points, confidence, model_version, {_iso_to_ms_sql('analyzed_at')}"
+    ),
+    'ingest_checkpoint': (
+        "chat_id, last_message_id, last_ts_utc, updated_at",
+        f"chat_id, last_message_id, {_iso_to_ms_sql('last_ts_utc')}, {_iso_to_ms_sql('updated_at')}"
+    ),
+    'high_water_marks': (
+        "chat_id, message_id, ts_utc, created_at",
+        f"chat_id, message_id, {_iso_to_ms_sql('ts_utc')}, {_iso_to_ms_sql('created_at')}"
+    ),
+}
+
+
+# Columns needed to build report message rows
+_REPORT_COLUMNS = """
+    SELECT m.message_id, m.ts_utc, m.from_username, m.text,
+           a.is_investment, a.sentiment, a.tokens, a.key_points, a.topic_key
+"""
+
+# PostgreSQL fills in defaults for messages without analysis column-wise, so
+# each row already matches the report message dict and only needs dict(row)
+_PG_REPORT_COLUMNS = """
+    SELECT m.message_id, m.ts_utc, m.from_username, m.text,
+           COALESCE(a.is_investment, FALSE) AS is_investment, a.sentiment,
+           COALESCE(a.tokens, '{}') AS tokens, COALESCE(a.key_points, '{}') AS key_points,
+           a.topic_key
+"""
+
+
+
+_REPORT_JOINS = """
+    FROM messages m
+    LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
+"""
+
+
+@lru_cache(maxsize=None)
+def _pg_report_queries(with_topic: bool, with_limit: bool) -> Tuple[str, str, str]:
+    """Build the (stats, top tokens, rows) report queries for PostgreSQL."""
+    where = "WHERE m.chat_id = $1 AND m.ts_utc BETWEEN $2 AND $3"
+    if with_topic:
+        where += " AND (a.topic_key ILIKE $4 OR $5 = ANY(a.tokens))"
+    
+    stats_query = f"""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE a.is_investment) AS investment,
+               COUNT(*) FILTER (WHERE a.is_investment AND a.sentiment = 'BULLISH') AS bullish,
+               COUNT(*) FILTER (WHERE a.is_investment AND a.sentiment = 'BEARISH') AS bearish,
+               COUNT(*) FILTER (WHERE a.is_investment AND a.sentiment = 'NEUTRAL') AS neutral
+        {_REPORT_JOINS} {where}
+    """
+    tokens_query = f"""
+        SELECT tok, COUNT(*) AS c
+        {_REPORT_JOINS} CROSS JOIN LATERAL unnest(a.tokens) AS tok
+        {where}
+        GROUP BY tok ORDER BY c DESC, tok LIMIT 10
+    """
+    rows_query = f"{_PG_REPORT_COLUMNS} {_REPORT_JOINS} {where} ORDER BY m.ts_utc DESC"
+    if with_limit:
+        rows_query += " LIMIT $6" if with_topic else " LIMIT $4"
+    return stats_query, tokens_query, rows_query
+
+
+@lru_cache(maxsize=None)
+def _sqlite_report_queries(with_topic: bool, with_limit: bool) -> Tuple[str, str, str]:
+    """Build the (stats, top tokens, rows) report queries for SQLite."""
+    where = "WHERE m.chat_id = ? AND m.ts_utc BETWEEN ? AND ?"
+    if with_topic:
+        where += " AND (a.topic_key LIKE ? OR a.tokens LIKE ?)"
+    
+    stats_query = f"""
+        SELECT COUNT(*) AS total,
+               COUNT(CASE WHEN a.is_investment THEN 1 END) AS investment,
+               COUNT(CASE WHEN a.is_investment AND a.sentiment = 'BULLISH' THEN 1 END) AS bullish,
+               COUNT(CASE WHEN a.is_investment AND a.sentiment = 'BEARISH' THEN 1 END) AS bearish,
+               COUNT(CASE WHEN a.is_investment AND a.sentiment = 'NEUTRAL' THEN 1 END) AS neutral
+        {_REPORT_JOINS} {where}
+    """
+    # Malformed legacy token lists count as empty instead of failing the report
+    tokens_query = f"""
+        SELECT t.value AS tok, COUNT(*) AS c
+        {_REPORT_JOINS}, json_each(CASE WHEN json_valid(a.tokens) THEN a.tokens END) AS t
+        {where}
+        GROUP BY tok ORDER BY c DESC, tok LIMIT 10
+    """
+    rows_query = f"{_REPORT_COLUMNS} {_REPORT_JOINS} {where} ORDER BY m.ts_utc DESC"
+    if with_limit:
+        rows_query += " LIMIT ?"
+    return stats_query, tokens_query, rows_query
+
+
+class MessageStagingBuffer:
+    """
+    Column-oriented buffer of messages awaiting a batched upsert.
+    
+    Each field is kept in its own list so a flush can hand whole columns to
+    the driver instead of reading attributes off every message again.
+    """
+    
+    COLUMNS = (
+        'chat_id', 'message_id', 'ts_utc', 'from_user_id', 'from_username',
+        'is_forwarded', 'forward_from', 'text', 'urls', 'reply_to_id', 'edit_date'
+    )
+    
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        """Drop all buffered rows."""
+        self.chat_id: List[int] = []
+        self.message_id: List[int] = []
+        self.ts_utc: List[datetime] = []
+        self.from_user_id: List[Optional[int]] = []
+        self.from_username: List[Optional[str]] = []
+        self.is_forwarded: List[bool] = []
+        self.forward_from: List[Optional[str]] = []
+        self.text: List[str] = []
+        self.urls: List[List[str]] = []
+        self.reply_to_id: List[Optional[int]] = []
+        self.edit_date: List[Optional[datetime]] = []
+    
+    def __len__(self) -> int:
+        return len(self.message_id)
+    
+    def append(self, message: TelegramMessage):
+        """Add one message to the buffer."""
+        self.chat_id.append(message.chat_id)
+        self.message_id.append(message.message_id)
+        self.ts_utc.append(message.ts_utc)
+        self.from_user_id.append(message.from_user_id)
+        self.from_username.append(message.from_username)
+        self.is_forwarded.append(message.is_forwarded)
+        self.forward_from.append(message.forward_from)
+        self.text.append(message.text)
+        self.urls.append(message.urls)
+        self.reply_to_id.append(message.reply_to_id)
+        self.edit_date.append(message.edit_date)
+    
+    def extend(self, messages: List[TelegramMessage]):
+        """Add several messages to the buffer."""
+        for message in messages:
+            self.append(message)
+    
+    def records(self):
+        """Iterate buffered rows as tuples in COLUMNS order."""
+        return zip(self.chat_id, self.message_id, self.ts_utc, self.from_user_id,
+                   self.from_username, self.is_forwarded, self.forward_from, self.text,
+                   self.urls, self.reply_to_id, self.edit_date)
+
+
 class DatabaseStore:
-    """Database abstraction layer supporting PostgreSQL and SQLite."""
+    """
+    Database abstraction layer supporting PostgreSQL and SQLite.
+    
+    ``DatabaseStore(db_url)`` returns the backend-specific subclass for the URL
+    (``_PgStore`` or ``_SqliteStore``), so every query method runs SQL built
+    once for that backend instead of branching and formatting per call.
+    """
+    
+    is_postgres = False
+    
+    def __new__(cls, db_url: str = None):
+        if cls is DatabaseStore:
+            url = db_url or config.db_url
+            cls = _PgStore if url.startswith("postgresql://") else _SqliteStore
+        return super().__new__(cls)
     
     def __init__(self, db_url: str = None):
         self.db_url = db_url or config.db_url
-        self.is_postgres = self.db_url.startswith("postgresql://")
         self.pool = None
         self.connection = None
-        
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Return connection pool usage (empty for SQLite)."""
+        return {}
+    
+    async def close(self):
+        """Close database connections."""
+        global _store_singleton
+        if _store_singleton is self:
+            _store_singleton = None
+    
+    async def upsert_messages_batch(self, messages: List[TelegramMessage]) -> int:
+        """Insert or update many messages in a single transaction. Returns the number written."""
+        buffer = MessageStagingBuffer()
+        buffer.extend(messages)
+        return await self.flush_messages(buffer)
+    
+    @staticmethod
+    def _report_result(stats, token_rows, messages: List[Dict[str, Any]]) -> ReportResult:
+        """Assemble a ReportResult from the aggregate rows and message dicts."""
+        total_messages, investment_messages, bullish, bearish, neutral = stats
+        return ReportResult(
+            total_messages=total_messages,
+            investment_messages=investment_messages,
+            sentiment_breakdown={
+                SentimentType.BULLISH: bullish,
+                SentimentType.BEARISH: bearish,
+                SentimentType.NEUTRAL: neutral,
+            },
+            top_tokens=[(tok, count) for tok, count in token_rows],
+            messages=messages
+        )
+
+
+class _PgStore(DatabaseStore):
+    """PostgreSQL backend using an asyncpg connection pool."""
+    
+    is_postgres = True
+    
+    # asyncpg caches the prepared statement per connection keyed on the query
+    # text, so these are passed verbatim on every call.
+    _SQL_UPSERT_MSG = """
+        INSERT INTO messages (
+            chat_id, message_id, ts_utc, from_user_id, from_username,
+            is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            text = EXCLUDED.text,
+            edit_date = EXCLUDED.edit_date,
+            urls = EXCLUDED.urls
+        WHERE messages.edit_date IS NULL OR messages.edit_date < EXCLUDED.edit_date
+    """
+    _SQL_UPSERT_ANA = """
+        INSERT INTO analysis (
+            chat_id, message_id, is_investment, sentiment, tokens,
+            topic_key, key_points, confidence, model_version, analyzed_at
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            is_investment = EXCLUDED.is_investment,
+            sentiment = EXCLUDED.sentiment,
+            tokens = EXCLUDED.tokens,
+            topic_key = EXCLUDED.topic_key,
+            key_points = EXCLUDED.key_points,
+            confidence = EXCLUDED.confidence,
+            model_version = EXCLUDED.model_version,
+            analyzed_at = EXCLUDED.analyzed_at
+    """
+    # Data-modifying CTEs always run, so the analysis is written even when the
+    # message upsert is skipped by its edit_date guard.
+    _SQL_UPSERT_MSG_ANA = """
+        WITH m AS (
+            INSERT INTO messages (
+                chat_id, message_id, ts_utc, from_user_id, from_username,
+                is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+            ON CONFLICT (chat_id, message_id) DO UPDATE SET
+                text = EXCLUDED.text,
+                edit_date = EXCLUDED.edit_date,
+                urls = EXCLUDED.urls
+            WHERE messages.edit_date IS NULL OR messages.edit_date < EXCLUDED.edit_date
+        )
+        INSERT INTO analysis (
+            chat_id, message_id, is_investment, sentiment, tokens,
+            topic_key, key_points, confidence, model_version, analyzed_at
+        ) VALUES ($1, $2, $12, $13, $14, $15, $16, $17, $18, $19)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            is_investment = EXCLUDED.is_investment,
+            sentiment = EXCLUDED.sentiment,
+            tokens = EXCLUDED.tokens,
+            topic_key = EXCLUDED.topic_key,
+            key_points = EXCLUDED.key_points,
+            confidence = EXCLUDED.confidence,
+            model_version = EXCLUDED.model_version,
+            analyzed_at = EXCLUDED.analyzed_at
+    """
+    _SQL_FLUSH_MSGS = """
+        INSERT INTO messages (
+            chat_id, message_id, ts_utc, from_user_id, from_username,
+            is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+        )
+        SELECT chat_id, message_id, ts_utc, from_user_id, from_username,
+               is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+        FROM _stage_msgs
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            text = EXCLUDED.text,
+            edit_date = EXCLUDED.edit_date,
+            urls = EXCLUDED.urls
+        WHERE messages.edit_date IS NULL OR messages.edit_date < EXCLUDED.edit_date
+    """
+    # Postgres arrays must be rectangular, so each row's URL list travels
+    # as a JSON string and is expanded back into TEXT[] server-side
+    _SQL_UNNEST_MSGS = """
+        INSERT INTO messages (
+            chat_id, message_id, ts_utc, from_user_id, from_username,
+            is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+        )
+        SELECT t.chat_id, t.message_id, t.ts_utc, t.from_user_id, t.from_username,
+               t.is_forwarded, t.forward_from, t.text,
+               ARRAY(SELECT jsonb_array_elements_text(t.urls::jsonb)),
+               t.reply_to_id, t.edit_date
+        FROM unnest(
+            $1::bigint[], $2::bigint[], $3::timestamptz[], $4::bigint[], $5::text[],
+            $6::bool[], $7::text[], $8::text[], $9::text[], $10::bigint[], $11::timestamptz[]
+        ) AS t(chat_id, message_id, ts_utc, from_user_id, from_username,
+               is_forwarded, forward_from, text, urls, reply_to_id, edit_date)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            text = EXCLUDED.text,
+            edit_date = EXCLUDED.edit_date,
+            urls = EXCLUDED.urls
+        WHERE messages.edit_date IS NULL OR messages.edit_date < EXCLUDED.edit_date
+    """
+    # Batches up to this size go through a single unnest() upsert; larger
+    # ones are worth the temp table setup that COPY needs
+    _UNNEST_MAX_ROWS = 1000
+    _SQL_FLUSH_ANA = """
+        INSERT INTO analysis (
+            chat_id, message_id, is_investment, sentiment, tokens,
+            topic_key, key_points, confidence, model_version, analyzed_at
+        )
+        SELECT chat_id, message_id, is_investment, sentiment, tokens,
+               topic_key, key_points, confidence, model_version, analyzed_at
+        FROM _stage_analysis
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            is_investment = EXCLUDED.is_investment,
+            sentiment = EXCLUDED.sentiment,
+            tokens = EXCLUDED.tokens,
+            topic_key = EXCLUDED.topic_key,
+            key_points = EXCLUDED.key_points,
+            confidence = EXCLUDED.confidence,
+            model_version = EXCLUDED.model_version,
+            analyzed_at = EXCLUDED.analyzed_at
+    """
+    _SQL_GET_CKPT = """
+        SELECT chat_id, last_message_id, last_ts_utc, updated_at
+        FROM ingest_checkpoint WHERE chat_id = $1
+    """
+    _SQL_UPD_CKPT = """
+        INSERT INTO ingest_checkpoint (chat_id, last_message_id, last_ts_utc, updated_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (chat_id) DO UPDATE SET
+            last_message_id = EXCLUDED.last_message_id,
+            last_ts_utc = EXCLUDED.last_ts_utc,
+            updated_at = EXCLUDED.updated_at
+    """
+    _SQL_SET_HWM = """
+        INSERT INTO high_water_marks (chat_id, message_id, ts_utc, created_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (chat_id) DO UPDATE SET
+            message_id = EXCLUDED.message_id,
+            ts_utc = EXCLUDED.ts_utc,
+            created_at = EXCLUDED.created_at
+    """
+    _SQL_GET_HWM = """
+        SELECT chat_id, message_id, ts_utc, created_at
+        FROM high_water_marks WHERE chat_id = $1
+    """
+    _SQL_REANALYSIS = """
+        SELECT m.message_id, m.edit_date
+        FROM messages m
+        LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
+        WHERE m.chat_id = $1
+        AND m.edit_date IS NOT NULL
+        AND (a.analyzed_at IS NULL OR m.edit_date > a.analyzed_at)
+    """
+    _SQL_SET_FWD = """
+        UPDATE messages SET forward_from = $3
+        WHERE chat_id = $1 AND message_id = $2
+    """
+    
     async def initialize(self):
         """Initialize database connection and create tables."""
-        if self.is_postgres:
-            # Parse URL to avoid DNS resolution issues in asyncpg
-            from urllib.parse import urlparse
-            parsed = urlparse(self.db_url)
-            
-            # Use direct connection parameters instead of URL
-            self.pool = await asyncpg.create_pool(
-                host=parsed.hostname,
-                port=parsed.port or 5432,
-                user=parsed.username,
-                password=parsed.password,
-                database=parsed.path.lstrip('/'),
-                ssl=False  # Disable SSL to avoid DNS issues
-            )
-            async with self.pool.acquire() as conn:
-                await self._create_tables_postgres(conn)
-        else:
-            # SQLite
-            db_path = self.db_url.replace("sqlite:///", "")
-            self.connection = await aiosqlite.connect(db_path)
-            await self._create_tables_sqlite(self.connection)
-            
-        logger.info(f"Database initialized: {'PostgreSQL' if self.is_postgres else 'SQLite'}")
+        # Parse URL to avoid DNS resolution issues in asyncpg
+        parsed = urlparse(self.db_url)
+        
+        # Use direct connection parameters instead of URL
+        self.pool = await asyncpg.create_pool(
+            host=parsed.hostname,
+            port=parsed.port or 5432,
+            user=parsed.username,
+            password=parsed.password,
+            database=parsed.path.lstrip('/'),
+            ssl=False,  # Disable SSL to avoid DNS issues
+            min_size=config.db_pool_min_size,
+            max_size=config.db_pool_max_size,
+            command_timeout=config.db_command_timeout,
+            max_queries=config.db_max_queries,
+            max_inactive_connection_lifetime=config.db_max_inactive_lifetime,
+            statement_cache_size=config.db_statement_cache_size,
+            server_settings={'jit': 'off', 'application_name': 'tg-analysis'}
+        )
+        async with self.pool.acquire() as conn:
+            await self._create_tables(conn)
+        await self._warm_pool()
+        
+        logger.info("Database initialized: PostgreSQL")
+    
+    async def _warm_pool(self):
+        """
+        Touch every pooled connection and cache the startup lookups on it.
+        
+        Connections are held at the same time so each pool slot is warmed,
+        rather than the same idle connection being handed back repeatedly.
+        """
+        connections = [await self.pool.acquire() for _ in range(self.pool.get_size())]
+        try:
+            for conn in connections:
+                await conn.fetchval("SELECT 1")
+                # Lookups by an unused id populate the statement cache without side effects
+                await conn.fetchrow(self._SQL_GET_CKPT, 0)
+                await conn.fetchrow(self._SQL_GET_HWM, 0)
+        finally:
+            for conn in connections:
+                await self.pool.release(conn)
+        
+        logger.debug(f"Warmed {len(connections)} pooled connections")
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Return connection pool usage."""
+        if not self.pool:
+            return {}
+        return {
+            'size': self.pool.get_size(),
+            'idle': self.pool.get_idle_size(),
+            'min_size': self.pool.get_min_size(),
+            'max_size': self.pool.get_max_size(),
+        }
     
     async def close(self):
         """Close database connections."""
-        if self.is_postgres and self.pool:
+        await super().close()
+        if self.pool:
             await self.pool.close()
-        elif self.connection:
-            await self.connection.close()
     
-    async def _create_tables_postgres(self, conn):
+    async def _create_tables(self, conn):
         """Create tables for PostgreSQL."""
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS messages (
@@ -121,14 +555,314 @@ class DatabaseStore:
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_investment ON analysis(is_investment)")
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_sentiment ON analysis(sentiment)")
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_tokens ON analysis USING GIN(tokens)")
+        # (chat_id, ts_utc DESC) serves both the report range filter and its
+        # ORDER BY ts_utc DESC LIMIT without a sort
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts_utc DESC)")
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_edit ON messages(chat_id, edit_date) WHERE edit_date IS NOT NULL"
+        )
+        # Covers the report aggregates so they can be answered index-only
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_invest_sent ON analysis(chat_id, is_investment, sentiment) INCLUDE (tokens)"
+        )
+    
+    async def upsert_message(self, message: TelegramMessage) -> bool:
+        """Insert or update a message. Returns True if inserted/updated."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._SQL_UPSERT_MSG,
+                message.chat_id, message.message_id, message.ts_utc,
+                message.from_user_id, message.from_username, message.is_forwarded,
+                message.forward_from, message.text, message.urls, message.reply_to_id,
+                message.edit_date)
+        return True
+    
+    async def upsert_analysis(self, analysis: MessageAnalysis) -> bool:
+        """Insert or update message analysis."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._SQL_UPSERT_ANA,
+                analysis.chat_id, analysis.message_id, analysis.is_investment,
+                analysis.sentiment.value, analysis.tokens, analysis.topic_key,
+                analysis.key_points, analysis.confidence, analysis.model_version,
+                analysis.analyzed_at)
+        return True
+    
+    async def upsert_message_and_analysis(self, message: TelegramMessage,
+                                          analysis: MessageAnalysis) -> bool:
+        """Insert or update a message and its analysis in one round trip."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._SQL_UPSERT_MSG_ANA,
+                message.chat_id, message.message_id, message.ts_utc,
+                message.from_user_id, message.from_username, message.is_forwarded,
+                message.forward_from, message.text, message.urls, message.reply_to_id,
+                message.edit_date,
+                analysis.is_investment, analysis.sentiment.value, analysis.tokens,
+                analysis.topic_key, analysis.key_points, analysis.confidence,
+                analysis.model_version, analysis.analyzed_at)
+        return True
+    
+    async def flush_messages(self, buffer: MessageStagingBuffer) -> int:
+        """
+        Upsert and clear everything in a staging buffer, in one transaction.
+        
+        Small and medium batches are bound as column arrays to one unnest()
+        upsert; large ones are staged with COPY into a temp table and upserted
+        with one INSERT ... SELECT. Returns the number of messages written.
+        """
+        count = len(buffer)
+        if not count:
+            return 0
+        
+        async with self.pool.acquire() as conn:
+            if count <= self._UNNEST_MAX_ROWS:
+                await conn.execute(
+                    self._SQL_UNNEST_MSGS,
+                    buffer.chat_id, buffer.message_id, buffer.ts_utc,
+                    buffer.from_user_id, buffer.from_username, buffer.is_forwarded,
+                    buffer.forward_from, buffer.text,
+                    [orjson.dumps(urls).decode() for urls in buffer.urls],
+                    buffer.reply_to_id, buffer.edit_date
+                )
+            else:
+                async with conn.transaction():
+                    await conn.execute(
+                        "CREATE TEMP TABLE _stage_msgs (LIKE messages INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    await conn.copy_records_to_table(
+                        "_stage_msgs", records=buffer.records(), columns=MessageStagingBuffer.COLUMNS
+                    )
+                    await conn.execute(self._SQL_FLUSH_MSGS)
+        
+        buffer.clear()
+        return count
+    
+    async def upsert_analyses_batch(self, analyses: List[MessageAnalysis]) -> int:
+        """Insert or update many analyses in a single transaction. Returns the number written."""
+        if not analyses:
+            return 0
+        
+        records = [
+            (a.chat_id, a.message_id, a.is_investment, a.sentiment.value, a.tokens,
+             a.topic_key, a.key_points, a.confidence, a.model_version, a.analyzed_at)
+            for a in analyses
+        ]
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE _stage_analysis (LIKE analysis INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table("_stage_analysis", records=records, columns=[
+                    'chat_id', 'message_id', 'is_investment', 'sentiment', 'tokens',
+                    'topic_key', 'key_points', 'confidence', 'model_version', 'analyzed_at'
+                ])
+                await conn.execute(self._SQL_FLUSH_ANA)
+        
+        return len(analyses)
     
-    async def _create_tables_sqlite(self, conn):
+    async def update_forward_from(self, chat_id: int, message_id: int,
+                                  forward_from: Optional[str]) -> bool:
+        """Set the forward source of a stored message. Returns False if it is not stored."""
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(self._SQL_SET_FWD, chat_id, message_id, forward_from)
+        return status != "UPDATE 0"
+    
+    async def get_checkpoint(self, chat_id: int) -> Optional[IngestCheckpoint]:
+        """Get the latest checkpoint for a chat."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(self._SQL_GET_CKPT, chat_id)
+        if row:
+            return IngestCheckpoint(
+                chat_id=row[0],
+                last_message_id=row[1],
+                last_ts_utc=row[2],
+                updated_at=row[3]
+            )
+        return None
+    
+    async def update_checkpoint(self, checkpoint: IngestCheckpoint):
+        """Update the checkpoint for a chat."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._SQL_UPD_CKPT,
+                checkpoint.chat_id, checkpoint.last_message_id,
+                checkpoint.last_ts_utc, checkpoint.updated_at)
+    
+    async def set_high_water_mark(self, hwm: HighWaterMark):
+        """Set the high water mark for a chat."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._SQL_SET_HWM,
+                hwm.chat_id, hwm.message_id, hwm.ts_utc, hwm.created_at)
+    
+    async def get_high_water_mark(self, chat_id: int) -> Optional[HighWaterMark]:
+        """Get the high water mark for a chat."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(self._SQL_GET_HWM, chat_id)
+        if row:
+            return HighWaterMark(
+                chat_id=row[0],
+                message_id=row[1],
+                ts_utc=row[2],
+                created_at=row[3]
+            )
+        return None
+    
+    async def get_messages_needing_reanalysis(self, chat_id: int) -> List[Tuple[int, datetime]]:
+        """Get messages that need re-analysis due to edits."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(self._SQL_REANALYSIS, chat_id)
+        return [(row['message_id'], row['edit_date']) for row in rows]
+    
+    async def generate_report(self, start_date: datetime, end_date: datetime,
+                            chat_id: int, topic_filter: Optional[str] = None,
+                            limit: Optional[int] = None) -> ReportResult:
+        """
+        Generate a report for the specified date range.
+        
+        Totals, the sentiment breakdown and top tokens are aggregated in the
+        database over the whole range; only the message rows for display
+        (``limit`` newest, or all if no limit) are fetched into Python, and
+        those are streamed through a cursor rather than loaded in one go.
+        """
+        stats_query, tokens_query, rows_query = _pg_report_queries(bool(topic_filter), bool(limit))
+        params = [chat_id, start_date, end_date]
+        if topic_filter:
+            params.extend([f"%{topic_filter}%", topic_filter])
+        row_params = params + [limit] if limit else params
+        
+        messages = []
+        async with self.pool.acquire() as conn:
+            stats = await conn.fetchrow(stats_query, *params)
+            token_rows = await conn.fetch(tokens_query, *params)
+            # Server-side cursors only exist inside a transaction
+            async with conn.transaction():
+                async for row in conn.cursor(rows_query, *row_params, prefetch=1000):
+                    messages.append(dict(row))
+        
+        return self._report_result(stats, token_rows, messages)
+
+
+class _SqliteStore(DatabaseStore):
+    """
+    SQLite backend with one writer connection and a small pool of readers.
+    
+    In WAL mode readers don't block the writer or each other, so reports and
+    lookups can run while ingestion writes. Writes are serialized by a lock so
+    multi-statement writes commit as a unit.
+    """
+    
+    # A forward source still being resolved arrives as NULL and must not
+    # clear one already stored
+    _SQL_UPSERT_MSG = """
+        INSERT INTO messages (
+            chat_id, message_id, ts_utc, from_user_id, from_username,
+            is_forwarded, forward_from, text, urls, reply_to_id, edit_date
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            ts_utc = excluded.ts_utc,
+            from_user_id = excluded.from_user_id,
+            from_username = excluded.from_username,
+            is_forwarded = excluded.is_forwarded,
+            forward_from = COALESCE(excluded.forward_from, messages.forward_from),
+            text = excluded.text,
+            urls = excluded.urls,
+            reply_to_id = excluded.reply_to_id,
+            edit_date = excluded.edit_date
+    """
+    _SQL_UPSERT_ANA = """
+        INSERT OR REPLACE INTO analysis (
+            chat_id, message_id, is_investment, sentiment, tokens,
+            topic_key, key_points, confidence, model_version, analyzed_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    _SQL_GET_CKPT = """
+        SELECT chat_id, last_message_id, last_ts_utc, updated_at
+        FROM ingest_checkpoint WHERE chat_id = ?
+    """
+    _SQL_UPD_CKPT = """
+        INSERT OR REPLACE INTO ingest_checkpoint
+        (chat_id, last_message_id, last_ts_utc, updated_at)
+        VALUES (?, ?, ?, ?)
+    """
+    _SQL_SET_HWM = """
+        INSERT OR REPLACE INTO high_water_marks
+        (chat_id, message_id, ts_utc, created_at)
+        VALUES (?, ?, ?, ?)
+    """
+    _SQL_GET_HWM = """
+        SELECT chat_id, message_id, ts_utc, created_at
+        FROM high_water_marks WHERE chat_id = ?
+    """
+    _SQL_REANALYSIS = """
+        SELECT m.message_id, m.edit_date
+        FROM messages m
+        LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
+        WHERE m.chat_id = ?
+        AND m.edit_date IS NOT NULL
+        AND (a.analyzed_at IS NULL OR m.edit_date > a.analyzed_at)
+    """
+    _SQL_SET_FWD = """
+        UPDATE messages SET forward_from = ?
+        WHERE chat_id = ? AND message_id = ?
+    """
+    
+    async def initialize(self):
+        """Initialize database connections and create tables."""
+        db_path = self.db_url.replace("sqlite:///", "")
+        self._write_lock = asyncio.Lock()
+        self.connection = await aiosqlite.connect(db_path)
+        self.connection.row_factory = aiosqlite.Row
+        await self._create_tables(self.connection)
+        
+        # Each connection to an in-memory database is a separate database,
+        # so reads stay on the writer there
+        self._readers = asyncio.Queue()
+        self._reader_connections = []
+        if db_path != ":memory:":
+            for _ in range(config.db_sqlite_readers):
+                conn = await aiosqlite.connect(db_path)
+                conn.row_factory = aiosqlite.Row
+                await conn.execute("PRAGMA query_only=ON")
+                await conn.execute("PRAGMA temp_store=MEMORY")
+                await conn.execute("PRAGMA cache_size=-16384")
+                self._reader_connections.append(conn)
+                self._readers.put_nowait(conn)
+        
+        logger.info(f"Database initialized: SQLite ({len(self._reader_connections)} readers)")
+    
+    async def close(self):
+        """Close database connections."""
+        await super().close()
+        for conn in getattr(self, '_reader_connections', []):
+            await conn.close()
+        if self.connection:
+            await self.connection.close()
+    
+    @asynccontextmanager
+    async def _reader(self):
+        """Borrow a read connection from the pool (the writer if there is none)."""
+        if not self._reader_connections:
+            yield self.connection
+            return
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+    
+    async def _create_tables(self, conn):
         """Create tables for SQLite."""
-        await conn.execute("""
+        # WAL + NORMAL sync: one fsync per checkpoint instead of per commit;
+        # keep temp structures and a 64 MiB page cache in memory
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        await conn.execute("PRAGMA cache_size=-65536")
+        
+        legacy = await self._detach_legacy_tables(conn)
+        
+        await conn.execute(f"""
             CREATE TABLE IF NOT EXISTS messages (
                 chat_id INTEGER NOT NULL,
                 message_id INTEGER NOT NULL,
-                ts_utc TEXT NOT NULL,
+                ts_utc INTEGER NOT NULL,
                 from_user_id INTEGER,
                 from_username TEXT,
                 is_forwarded BOOLEAN DEFAULT 0,
@@ -136,13 +870,13 @@ class DatabaseStore:
                 text TEXT NOT NULL,
                 urls TEXT,
                 reply_to_id INTEGER,
-                edit_date TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                edit_date INTEGER,
+                created_at INTEGER DEFAULT {_SQLITE_NOW_MS},
                 PRIMARY KEY (chat_id, message_id)
             )
         """)
         
-        await conn.execute("""
+        await conn.execute(f"""
             CREATE TABLE IF NOT EXISTS analysis (
                 chat_id INTEGER NOT NULL,
                 message_id INTEGER NOT NULL,
@@ -153,321 +887,270 @@ class DatabaseStore:
                 key_points TEXT,
                 confidence REAL,
                 model_version INTEGER DEFAULT 1,
-                analyzed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                analyzed_at INTEGER DEFAULT {_SQLITE_NOW_MS},
                 PRIMARY KEY (chat_id, message_id),
                 FOREIGN KEY (chat_id, message_id) REFERENCES messages(chat_id, message_id)
             )
         """)
         
-        await conn.execute("""
+        await conn.execute(f"""
             CREATE TABLE IF NOT EXISTS ingest_checkpoint (
                 chat_id INTEGER PRIMARY KEY,
                 last_message_id INTEGER NOT NULL,
-                last_ts_utc TEXT NOT NULL,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                last_ts_utc INTEGER NOT NULL,
+                updated_at INTEGER DEFAULT {_SQLITE_NOW_MS}
             )
         """)
         
-        await conn.execute("""
+        await conn.execute(f"""
             CREATE TABLE IF NOT EXISTS high_water_marks (
                 chat_id INTEGER PRIMARY KEY,
                 message_id INTEGER NOT NULL,
-                ts_utc TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                ts_utc INTEGER NOT NULL,
+                created_at INTEGER DEFAULT {_SQLITE_NOW_MS}
             )
         """)
         
+        if legacy:
+            await self._copy_legacy_tables(conn)
+        
         # Create indexes
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts_utc)")
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_investment ON analysis(is_investment)")
         await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_sentiment ON analysis(sentiment)")
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts_utc DESC)")
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_edit ON messages(chat_id, edit_date)")
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_invest_sent ON analysis(chat_id, is_investment, sentiment)")
         
         await conn.commit()
     
+    async def _detach_legacy_tables(self, conn) -> bool:
+        """
+        Move aside tables that still store timestamps as ISO-8601 TEXT.
+        
+        Column affinity would turn converted integers back into text, so such
+        tables are renamed, recreated with INTEGER columns and copied across
+        by ``_copy_legacy_tables``. Returns True if tables were moved.
+        """
+        async with conn.execute("PRAGMA table_info(messages)") as cursor:
+            column_types = {row[1]: row[2] for row in await cursor.fetchall()}
+        if column_types.get('ts_utc', '').upper() != 'TEXT':
+            return False
+        
+        logger.info("Migrating SQLite timestamps from ISO text to epoch milliseconds")
+        # Committed together with the rest of the schema setup
+        await conn.execute("BEGIN")
+        for table in _SQLITE_LEGACY_COPY:
+            await conn.execute(f"ALTER TABLE {table} RENAME TO _{table}_legacy")
+        # Free the index names for the new tables
+        async with conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+        ) as cursor:
+            for (name,) in await cursor.fetchall():
+                await conn.execute(f"DROP INDEX {name}")
+        return True
+    
+    async def _copy_legacy_tables(self, conn):
+        """Copy rows from moved-aside legacy tables, converting timestamps, then drop them."""
+        for table, (columns, expressions) in _SQLITE_LEGACY_COPY.items():
+            await conn.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {expressions} FROM _{table}_legacy"
+            )
+        for table in reversed(list(_SQLITE_LEGACY_COPY)):
+            await conn.execute(f"DROP TABLE _{table}_legacy")
+    
+    @staticmethod
+    def _message_params(message: TelegramMessage) -> tuple:
+        """Bind parameters for _SQL_UPSERT_MSG."""
+        return (message.chat_id, message.message_id, _to_epoch_ms(message.ts_utc),
+                message.from_user_id, message.from_username, message.is_forwarded,
+                message.forward_from, message.text, orjson.dumps(message.urls).decode(),
+                message.reply_to_id, _to_epoch_ms(message.edit_date))
+    
+    @staticmethod
+    def _analysis_params(analysis: MessageAnalysis) -> tuple:
+        """Bind parameters for _SQL_UPSERT_ANA."""
+        return (analysis.chat_id, analysis.message_id, analysis.is_investment,
+                analysis.sentiment.value, orjson.dumps(analysis.tokens).decode(),
+                analysis.topic_key, orjson.dumps(analysis.key_points).decode(),
+                analysis.confidence, analysis.model_version,
+                _to_epoch_ms(analysis.analyzed_at))
+    
     async def upsert_message(self, message: TelegramMessage) -> bool:
         """Insert or update a message. Returns True if inserted/updated."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                result = await conn.execute("""
-                    INSERT INTO messages (
-                        chat_id, message_id, ts_utc, from_user_id, from_username,
-                        is_forwarded, forward_from, text, urls, reply_to_id, edit_date
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (chat_id, message_id) DO UPDATE SET
-                        text = EXCLUDED.text,
-                        edit_date = EXCLUDED.edit_date,
-                        urls = EXCLUDED.urls
-                    WHERE messages.edit_date IS NULL OR messages.edit_date < EXCLUDED.edit_date
-                """, message.chat_id, message.message_id, message.ts_utc,
-                    message.from_user_id, message.from_username, message.is_forwarded,
-                    message.forward_from, message.text, message.urls, message.reply_to_id,
-                    message.edit_date)
-                return True
-        else:
-            async with self.connection.execute("""
-                INSERT OR REPLACE INTO messages (
-                    chat_id, message_id, ts_utc, from_user_id, from_username,
-                    is_forwarded, forward_from, text, urls, reply_to_id, edit_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (message.chat_id, message.message_id, message.ts_utc.isoformat(),
-                  message.from_user_id, message.from_username, message.is_forwarded,
-                  message.forward_from, message.text, json.dumps(message.urls),
-                  message.reply_to_id, message.edit_date.isoformat() if message.edit_date else None)):
-                pass
+        async with self._write_lock:
+            await self.connection.execute(self._SQL_UPSERT_MSG, self._message_params(message))
             await self.connection.commit()
-            return True
+        return True
     
     async def upsert_analysis(self, analysis: MessageAnalysis) -> bool:
         """Insert or update message analysis."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO analysis (
-                        chat_id, message_id, is_investment, sentiment, tokens,
-                        topic_key, key_points, confidence, model_version, analyzed_at
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-                    ON CONFLICT (chat_id, message_id) DO UPDATE SET
-                        is_investment = EXCLUDED.is_investment,
-                        sentiment = EXCLUDED.sentiment,
-                        tokens = EXCLUDED.tokens,
-                        topic_key = EXCLUDED.topic_key,
-                        key_points = EXCLUDED.key_points,
-                        confidence = EXCLUDED.confidence,
-                        model_version = EXCLUDED.model_version,
-                        analyzed_at = EXCLUDED.analyzed_at
-                """, analysis.chat_id, analysis.message_id, analysis.is_investment,
-                    analysis.sentiment.value, analysis.tokens, analysis.topic_key,
-                    analysis.key_points, analysis.confidence, analysis.model_version,
-                    analysis.analyzed_at)
-        else:
-            async with self.connection.execute("""
-                INSERT OR REPLACE INTO analysis (
-                    chat_id, message_id, is_investment, sentiment, tokens,
-                    topic_key, key_points, confidence, model_version, analyzed_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (analysis.chat_id, analysis.message_id, analysis.is_investment,
-                  analysis.sentiment.value, json.dumps(analysis.tokens),
-                  analysis.topic_key, json.dumps(analysis.key_points),
-                  analysis.confidence, analysis.model_version,
-                  analysis.analyzed_at.isoformat())):
-                pass
+        async with self._write_lock:
+            await self.connection.execute(self._SQL_UPSERT_ANA, self._analysis_params(analysis))
             await self.connection.commit()
         return True
     
+    async def upsert_message_and_analysis(self, message: TelegramMessage,
+                                          analysis: MessageAnalysis) -> bool:
+        """Insert or update a message and its analysis with a single commit."""
+        async with self._write_lock:
+            await self.connection.execute(self._SQL_UPSERT_MSG, self._message_params(message))
+            await self.connection.execute(self._SQL_UPSERT_ANA, self._analysis_params(analysis))
+            await self.connection.commit()
+        return True
+    
+    async def flush_messages(self, buffer: MessageStagingBuffer) -> int:
+        """
+        Upsert and clear everything in a staging buffer, in one transaction.
+        
+        Converted columns are zipped straight into executemany with a single
+        commit. Returns the number of messages written.
+        """
+        count = len(buffer)
+        if not count:
+            return 0
+        
+        async with self._write_lock:
+            await self.connection.executemany(self._SQL_UPSERT_MSG, zip(
+                buffer.chat_id, buffer.message_id,
+                [_to_epoch_ms(ts) for ts in buffer.ts_utc],
+                buffer.from_user_id, buffer.from_username, buffer.is_forwarded,
+                buffer.forward_from, buffer.text,
+                [orjson.dumps(urls).decode() for urls in buffer.urls],
+                buffer.reply_to_id,
+                [_to_epoch_ms(d) for d in buffer.edit_date]))
+            await self.connection.commit()
+        
+        buffer.clear()
+        return count
+    
+    async def upsert_analyses_batch(self, analyses: List[MessageAnalysis]) -> int:
+        """Insert or update many analyses in a single transaction. Returns the number written."""
+        if not analyses:
+            return 0
+        
+        async with self._write_lock:
+            await self.connection.executemany(
+                self._SQL_UPSERT_ANA, [self._analysis_params(a) for a in analyses]
+            )
+            await self.connection.commit()
+        
+        return len(analyses)
+    
+    async def update_forward_from(self, chat_id: int, message_id: int,
+                                  forward_from: Optional[str]) -> bool:
+        """Set the forward source of a stored message. Returns False if it is not stored."""
+        async with self._write_lock:
+            cursor = await self.connection.execute(
+                self._SQL_SET_FWD, (forward_from, chat_id, message_id)
+            )
+            await self.connection.commit()
+        return bool(cursor.rowcount)
+    
     async def get_checkpoint(self, chat_id: int) -> Optional[IngestCheckpoint]:
         """Get the latest checkpoint for a chat."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    "SELECT * FROM ingest_checkpoint WHERE chat_id = $1", chat_id
-                )
-                if row:
-                    return IngestCheckpoint(**dict(row))
-        else:
-            async with self.connection.execute(
-                "SELECT * FROM ingest_checkpoint WHERE chat_id = ?", (chat_id,)
-            ) as cursor:
+        async with self._reader() as conn:
+            async with conn.execute(self._SQL_GET_CKPT, (chat_id,)) as cursor:
                 row = await cursor.fetchone()
-                if row:
-                    return IngestCheckpoint(
-                        chat_id=row[0],
-                        last_message_id=row[1],
-                        last_ts_utc=datetime.fromisoformat(row[2]),
-                        updated_at=datetime.fromisoformat(row[3])
-                    )
+        if row:
+            return IngestCheckpoint(
+                chat_id=row[0],
+                last_message_id=row[1],
+                last_ts_utc=_from_epoch_ms(row[2]),
+                updated_at=_from_epoch_ms(row[3])
+            )
         return None
     
     async def update_checkpoint(self, checkpoint: IngestCheckpoint):
         """Update the checkpoint for a chat."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO ingest_checkpoint (chat_id, last_message_id, last_ts_utc, updated_at)
-                    VALUES ($1, $2, $3, $4)
-                    ON CONFLICT (chat_id) DO UPDATE SET
-                        last_message_id = EXCLUDED.last_message_id,
-                        last_ts_utc = EXCLUDED.last_ts_utc,
-                        updated_at = EXCLUDED.updated_at
-                """, checkpoint.chat_id, checkpoint.last_message_id,
-                    checkpoint.last_ts_utc, checkpoint.updated_at)
-        else:
-            async with self.connection.execute("""
-                INSERT OR REPLACE INTO ingest_checkpoint 
-                (chat_id, last_message_id, last_ts_utc, updated_at)
-                VALUES (?, ?, ?, ?)
-            """, (checkpoint.chat_id, checkpoint.last_message_id,
-                  checkpoint.last_ts_utc.isoformat(), checkpoint.updated_at.isoformat())):
-                pass
+        async with self._write_lock:
+            await self.connection.execute(self._SQL_UPD_CKPT, (
+                checkpoint.chat_id, checkpoint.last_message_id,
+                _to_epoch_ms(checkpoint.last_ts_utc), _to_epoch_ms(checkpoint.updated_at)))
             await self.connection.commit()
     
     async def set_high_water_mark(self, hwm: HighWaterMark):
         """Set the high water mark for a chat."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO high_water_marks (chat_id, message_id, ts_utc, created_at)
-                    VALUES ($1, $2, $3, $4)
-                    ON CONFLICT (chat_id) DO UPDATE SET
-                        message_id = EXCLUDED.message_id,
-                        ts_utc = EXCLUDED.ts_utc,
-                        created_at = EXCLUDED.created_at
-                """, hwm.chat_id, hwm.message_id, hwm.ts_utc, hwm.created_at)
-        else:
-            async with self.connection.execute("""
-                INSERT OR REPLACE INTO high_water_marks 
-                (chat_id, message_id, ts_utc, created_at)
-                VALUES (?, ?, ?, ?)
-            """, (hwm.chat_id, hwm.message_id, hwm.ts_utc.isoformat(),
-                  hwm.created_at.isoformat())):
-                pass
+        async with self._write_lock:
+            await self.connection.execute(self._SQL_SET_HWM, (
+                hwm.chat_id, hwm.message_id, _to_epoch_ms(hwm.ts_utc),
+                _to_epoch_ms(hwm.created_at)))
             await self.connection.commit()
     
     async def get_high_water_mark(self, chat_id: int) -> Optional[HighWaterMark]:
         """Get the high water mark for a chat."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    "SELECT * FROM high_water_marks WHERE chat_id = $1", chat_id
-                )
-                if row:
-                    return HighWaterMark(**dict(row))
-        else:
-            async with self.connection.execute(
-                "SELECT * FROM high_water_marks WHERE chat_id = ?", (chat_id,)
-            ) as cursor:
+        async with self._reader() as conn:
+            async with conn.execute(self._SQL_GET_HWM, (chat_id,)) as cursor:
                 row = await cursor.fetchone()
-                if row:
-                    return HighWaterMark(
-                        chat_id=row[0],
-                        message_id=row[1],
-                        ts_utc=datetime.fromisoformat(row[2]),
-                        created_at=datetime.fromisoformat(row[3])
-                    )
+        if row:
+            return HighWaterMark(
+                chat_id=row[0],
+                message_id=row[1],
+                ts_utc=_from_epoch_ms(row[2]),
+                created_at=_from_epoch_ms(row[3])
+            )
         return None
     
     async def get_messages_needing_reanalysis(self, chat_id: int) -> List[Tuple[int, datetime]]:
         """Get messages that need re-analysis due to edits."""
-        if self.is_postgres:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT m.message_id, m.edit_date
-                    FROM messages m
-                    LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
-                    WHERE m.chat_id = $1 
-                    AND m.edit_date IS NOT NULL
-                    AND (a.analyzed_at IS NULL OR m.edit_date > a.analyzed_at)
-                """, chat_id)
-                return [(row['message_id'], row['edit_date']) for row in rows]
-        else:
-            async with self.connection.execute("""
-                SELECT m.message_id, m.edit_date
-                FROM messages m
-                LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
-                WHERE m.chat_id = ? 
-                AND m.edit_date IS NOT NULL
-                AND (a.analyzed_at IS NULL OR m.edit_date > a.analyzed_at)
-            """, (chat_id,)) as cursor:
+        async with self._reader() as conn:
+            async with conn.execute(self._SQL_REANALYSIS, (chat_id,)) as cursor:
                 rows = await cursor.fetchall()
-                return [(row[0], datetime.fromisoformat(row[1])) for row in rows if row[1]]
+        return [(row[0], _from_epoch_ms(row[1])) for row in rows if row[1] is not None]
+    
+    @staticmethod
+    def _report_message(row) -> Dict[str, Any]:
+        """Convert a projected report row into a report message dict."""
+        return {
+            'message_id': row['message_id'],
+            'ts_utc': _from_epoch_ms(row['ts_utc']),
+            'from_username': row['from_username'],
+            'text': row['text'],
+            'is_investment': bool(row['is_investment']),
+            'sentiment': row['sentiment'],
+            'tokens': _json_list(row['tokens']),
+            'key_points': _json_list(row['key_points']),
+            'topic_key': row['topic_key']
+        }
     
-    async def generate_report(self, start_date: datetime, end_date: datetime, 
+    async def generate_report(self, start_date: datetime, end_date: datetime,
                             chat_id: int, topic_filter: Optional[str] = None,
                             limit: Optional[int] = None) -> ReportResult:
-        """Generate a report for the specified date range."""
-        base_query = """
-            SELECT m.*, a.*
-            FROM messages m
-            LEFT JOIN analysis a ON m.chat_id = a.chat_id AND m.message_id = a.message_id
-            WHERE m.chat_id = {} AND m.ts_utc BETWEEN {} AND {}
         """
+        Generate a report for the specified date range.
         
-        params = [chat_id]
-        
-        if self.is_postgres:
-            query = base_query.format("$1", "$2", "$3")
-            params.extend([start_date, end_date])
-            
-            if topic_filter:
-                query += " AND (a.topic_key ILIKE $4 OR $4 = ANY(a.tokens))"
-                params.append(f"%{topic_filter}%")
-            
-            query += " ORDER BY m.ts_utc DESC"
-            if limit:
-                query += f" LIMIT ${len(params) + 1}"
-                params.append(limit)
-                
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch(query, *params)
-        else:
-            query = base_query.format("?", "?", "?")
-            params.extend([start_date.isoformat(), end_date.isoformat()])
-            
-            if topic_filter:
-                query += " AND (a.topic_key LIKE ? OR a.tokens LIKE ?)"
-                params.extend([f"%{topic_filter}%", f"%{topic_filter}%"])
-            
-            query += " ORDER BY m.ts_utc DESC"
-            if limit:
-                query += " LIMIT ?"
-                params.append(limit)
-                
-            async with self.connection.execute(query, params) as cursor:
-                rows = await cursor.fetchall()
+        Totals, the sentiment breakdown and top tokens are aggregated in the
+        database over the whole range; only the message rows for display
+        (``limit`` newest, or all if no limit) are fetched into Python, and
+        those are streamed through the cursor rather than loaded in one go.
+        """
+        stats_query, tokens_query, rows_query = _sqlite_report_queries(bool(topic_filter), bool(limit))
+        params = [chat_id, _to_epoch_ms(start_date), _to_epoch_ms(end_date)]
+        if topic_filter:
+            params.extend([f"%{topic_filter}%", f"%{topic_filter}%"])
+        row_params = params + [limit] if limit else params
         
-        # Process results
-        total_messages = len(rows)
-        investment_messages = 0
-        sentiment_breakdown = {SentimentType.BULLISH: 0, SentimentType.BEARISH: 0, SentimentType.NEUTRAL: 0}
-        token_counts = {}
         messages = []
+        async with self._reader() as conn:
+            async with conn.execute(stats_query, params) as cursor:
+                stats = await cursor.fetchone()
+            async with conn.execute(tokens_query, params) as cursor:
+                token_rows = await cursor.fetchall()
+            async with conn.execute(rows_query, row_params) as cursor:
+                async for row in cursor:
+                    messages.append(self._report_message(row))
         
-        for row in rows:
-            if self.is_postgres:
-                row_dict = dict(row)
-                is_investment = row_dict.get('is_investment', False)
-                sentiment = row_dict.get('sentiment')
-                tokens = row_dict.get('tokens', []) or []
-                key_points = row_dict.get('key_points', []) or []
-            else:
-                # SQLite row handling
-                is_investment = bool(row[12]) if len(row) > 12 and row[12] is not None else False
-                sentiment = row[13] if len(row) > 13 else None
-                tokens_json = row[14] if len(row) > 14 else None
-                try:
-                    tokens = json.loads(tokens_json) if tokens_json else []
-                except (json.JSONDecodeError, TypeError):
-                    tokens = []
-            
-            if is_investment:
-                investment_messages += 1
-                
-                # Only count sentiment for investment-related messages
-                if sentiment:
-                    sentiment_breakdown[SentimentType(sentiment)] += 1
-                
-            for token in tokens:
-                token_counts[token] = token_counts.get(token, 0) + 1
-            
-            # Build message dict
-            msg_dict = {
-                'message_id': row[1],
-                'ts_utc': row[2] if self.is_postgres else datetime.fromisoformat(row[2]),
-                'from_username': row[4],
-                'text': row[7],
-                'is_investment': is_investment,
-                'sentiment': sentiment,
-                'tokens': tokens,
-                'key_points': key_points if self.is_postgres else (json.loads(row[16]) if len(row) > 16 and row[16] else []),
-                'topic_key': row[15] if len(row) > 15 else None
-            }
-            messages.append(msg_dict)
-        
-        top_tokens = sorted(token_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        return ReportResult(
-            total_messages=total_messages,
-            investment_messages=investment_messages,
-            sentiment_breakdown=sentiment_breakdown,
-            top_tokens=top_tokens,
-            messages=messages
-        )
+        return self._report_result(stats, token_rows, messages)
+
+
+_store_singleton: Optional[DatabaseStore] = None
+
+
+async def get_store() -> DatabaseStore:
+    """Return the shared, initialized store, creating it on first use."""
+    global _store_singleton
+    if _store_singleton is None:
+        store = DatabaseStore()
+        await store.initialize()
+        _store_singleton = store
+    return _store_singleton
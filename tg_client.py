@@ -2,18 +2,180 @@
 Telegram client wrapper using Telethon for message ingestion.
 """
 import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 from datetime import datetime, timezone
 from typing import List, Optional, AsyncGenerator, Tuple
 from urllib.parse import urlparse
 
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, utils
 from telethon.errors import FloodWaitError, ChannelPrivateError, ChatAdminRequiredError
-from telethon.tl.types import Message, User, Channel, Chat
+from telethon.tl.types import Message, MessageEntityTextUrl, UpdateUserName, User, Channel, Chat
 from loguru import logger
 
-from models import TelegramMessage, HighWaterMark
+from models import TelegramMessage, HighWaterMark, MessageCursor
 from config import config
 
+UTC = timezone.utc
+
+# Ceiling for the request delay after repeated flood waits (seconds)
+_MAX_REQUEST_DELAY = 30.0
+# Consecutive successful requests before the request delay is relaxed
+_DELAY_RELAX_AFTER = 20
+# Messages Telegram returns per history request
+_HISTORY_PAGE_SIZE = 100
+# Consecutive failed attempts before a backfill scan gives up
+_PREFETCH_ATTEMPTS = 3
+# Senders and forward sources kept between batches
+_ENTITY_CACHE_SIZE = 10_000
+# Forward sources looked up together by the background resolver
+_FORWARD_BATCH_SIZE = 100
+# Deferred forwards kept while their messages wait to be stored
+_FORWARD_PENDING_SIZE = 10_000
+# Live updates waiting for the handler workers, across all of them
+_EVENT_QUEUE_SIZE = 1024
+# Handler workers, each draining its own share of the live updates
+_EVENT_WORKERS = 4
+# Seconds a live update waits for queue space before it is dropped
+_EVENT_PUT_TIMEOUT = 10.0
+# Smallest batch whose conversion is handed to the conversion threads
+_CONVERT_OFFLOAD_MIN = 20
+# Words that mark a first line as message text rather than a username
+_MESSAGE_WORDS = ('http', 'www', '$', 'the ', 'and ', 'this ', 'that ')
+
+
+def _ensure_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """Tag a naive Telethon datetime as UTC; aware ones are returned as-is."""
+    if dt is None or dt.tzinfo is not None:
+        return dt
+    return dt.replace(tzinfo=UTC)
+
+
+def _forward_name(entity, peer) -> Optional[str]:
+    """Name stored as forward_from for a forward source, or the raw peer if unknown."""
+    if entity is None:
+        return str(peer)
+    if hasattr(entity, 'title'):
+        return entity.title
+    if hasattr(entity, 'username'):
+        return entity.username
+    return None
+
+
+def _convert_message_sync(message: Message, entities: dict, chat_id: int) -> TelegramMessage:
+    """Convert a Telethon Message using entities from _resolve_entities."""
+    # Extract URLs from message text
+    urls = [
+        entity.url for entity in message.entities or ()
+        if isinstance(entity, MessageEntityTextUrl) and entity.url
+    ]
+    
+    # Get sender information
+    from_user_id = message.sender_id or None
+    from_username = None
+    if from_user_id:
+        sender = entities.get(from_user_id)
+        if isinstance(sender, User) and sender.username:
+            from_username = sender.username
+    
+    # Handle forwarded messages
+    forward = message.forward
+    is_forwarded = forward is not None
+    forward_from = None
+    if is_forwarded:
+        if forward.from_name:
+            forward_from = forward.from_name
+        elif forward.from_id:
+            peer_id = utils.get_peer_id(forward.from_id)
+            # Sources missing from the map are left to the forward resolver
+            if peer_id in entities:
+                forward_from = _forward_name(entities[peer_id], forward.from_id)
+    
+    # Extract username from first line of message text
+    message_text = message.message or ""
+    extracted_username = None
+    actual_text = message_text
+    
+    if message_text.strip():
+        lines = message_text.strip().split('\n')
+        if len(lines) > 1:
+            # First line is likely the username, rest is the actual message
+            first_line = lines[0].strip()
+            # Simple heuristic: if first line is short and doesn't contain common message words
+            if (len(first_line) <= 50 and 
+                not any(word in first_line.lower() for word in _MESSAGE_WORDS) and
+                len(first_line.split()) <= 3):
+                extracted_username = first_line
+                actual_text = '\n'.join(lines[1:]).strip()
+    
+    # Use extracted username if available, otherwise fall back to API username
+    final_username = extracted_username or from_username
+    
+    return TelegramMessage(
+        chat_id=chat_id,
+        message_id=message.id,
+        ts_utc=_ensure_utc(message.date),
+        from_user_id=from_user_id,
+        from_username=final_username,
+        is_forwarded=is_forwarded,
+        forward_from=forward_from,
+        text=actual_text,
+        urls=urls,
+        reply_to_id=message.reply_to_msg_id,
+        edit_date=_ensure_utc(message.edit_date)
+    )
+
+
+def _convert_batch_sync(messages: List[Message], entities: dict, chat_id: int) -> List[TelegramMessage]:
+    """Convert a batch of Telethon Messages; safe to run off the event loop."""
+    return [_convert_message_sync(message, entities, chat_id) for message in messages]
+
+
+class _TokenBucket:
+    """
+    Token bucket pacing requests to one per `interval` seconds on average.
+    
+    Up to `capacity` tokens accumulate while idle, so a request only waits
+    when the burst allowance is used up.
+    """
+    
+    def __init__(self, interval: float, capacity: int):
+        self.interval = interval
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._last_refill)
+        if self.interval > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed / self.interval)
+        else:
+            self.tokens = self.capacity
+        self._last_refill = max(self._last_refill, now)
+    
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._last_refill:
+                    # Paused
+                    await asyncio.sleep(self._last_refill - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.interval)
+    
+    def pause(self, seconds: float):
+        """Hold back all requests for `seconds` and drop any saved-up burst."""
+        self.tokens = 0.0
+        self._last_refill = max(self._last_refill, time.monotonic() + seconds)
+
 
 class TelegramClientWrapper:
     """Wrapper around Telethon client with rate limiting and error handling."""
@@ -25,11 +187,43 @@ class TelegramClientWrapper:
         self.client = None
         self.target_chat_id = config.target_chat_id
         self._rate_limit_delay = config.rate_limit_delay
+        # The bucket interval is raised after each flood wait and relaxed
+        # back after a run of successes
+        self._bucket = _TokenBucket(self._rate_limit_delay, config.rate_limit_burst)
+        self._requests_since_flood = 0
+        # Peer ID -> User/Channel/Chat, least recently used first
+        self._entity_cache: OrderedDict = OrderedDict()
+        # Message ID -> (peer ID, peer) for deferred forwards not stored yet
+        self._pending_forwards: OrderedDict = OrderedDict()
+        # (message ID, peer ID, peer) of stored messages, drained by _forward_resolver_worker
+        self._forward_queue: Optional[asyncio.Queue] = None
+        self._forward_task = None
+        # (raw message, handler, lean) from live updates, one queue per _event_worker
+        self._event_queues: List[asyncio.Queue] = []
+        self._event_workers: List[asyncio.Task] = []
+        # Threads converting large batches while the event loop keeps fetching
+        self._convert_pool: Optional[ThreadPoolExecutor] = None
         
     async def initialize(self):
         """Initialize the Telegram client and connect."""
         self.client = TelegramClient(self.session_path, self.api_id, self.api_hash)
         await self.client.start()
+        self._convert_pool = ThreadPoolExecutor(max_workers=2)
+        
+        # Cached senders would keep reporting a username after it changes
+        @self.client.on(events.Raw(UpdateUserName))
+        async def username_handler(update):
+            self.invalidate_user(update.user_id)
+        
+        # Live handlers only enqueue, so a slow handler never holds up
+        # Telethon's update dispatch
+        self._event_queues = [
+            asyncio.Queue(maxsize=_EVENT_QUEUE_SIZE // _EVENT_WORKERS)
+            for _ in range(_EVENT_WORKERS)
+        ]
+        self._event_workers = [
+            asyncio.create_task(self._event_worker(queue)) for queue in self._event_queues
+        ]
         
         # Verify we can access the target chat
         try:
@@ -41,8 +235,80 @@ class TelegramClientWrapper:
             
         logger.info("Telegram client initialized successfully")
     
+    def invalidate_user(self, user_id: int):
+        """Drop a cached sender so it is looked up again on its next message."""
+        self._entity_cache.pop(user_id, None)
+    
+    def start_forward_resolver(self, callback):
+        """
+        Look up forward sources in the background instead of during conversion.
+        
+        Forwards from peers not in the entity cache are converted with
+        forward_from left as None. Once the caller has stored such messages it
+        passes their IDs to resolve_stored_forwards, and
+        `callback(message_id, forward_from)` is awaited when the source is
+        known. The callback returns False if the message is not stored.
+        """
+        if self._forward_task is None:
+            self._forward_queue = asyncio.Queue()
+            self._forward_task = asyncio.create_task(self._forward_resolver_worker(callback))
+    
+    def resolve_stored_forwards(self, message_ids: List[int]):
+        """Queue the deferred forward sources of messages that are now stored."""
+        pending = self._pending_forwards
+        if not pending or self._forward_queue is None:
+            return
+        for message_id in message_ids:
+            deferred = pending.pop(message_id, None)
+            if deferred is not None:
+                self._forward_queue.put_nowait((message_id, *deferred))
+    
+    def _defer_forward(self, message_id: int, peer_id: int, peer):
+        """Hold a forward source until its message is stored."""
+        pending = self._pending_forwards
+        pending[message_id] = (peer_id, peer)
+        pending.move_to_end(message_id)
+        while len(pending) > _FORWARD_PENDING_SIZE:
+            dropped, _ = pending.popitem(last=False)
+            logger.warning(f"Gave up on the forward source of message {dropped}: it was never stored")
+    
+    async def _forward_resolver_worker(self, callback):
+        """Resolve queued forward sources in batches and pass their names to callback."""
+        queue = self._forward_queue
+        cache = self._entity_cache
+        while True:
+            pending = [await queue.get()]
+            while len(pending) < _FORWARD_BATCH_SIZE and not queue.empty():
+                pending.append(queue.get_nowait())
+            
+            missing = {peer_id: peer for _, peer_id, peer in pending if peer_id not in cache}
+            if missing:
+                self._cache_entities(await self._lookup_entities(missing))
+            
+            for message_id, peer_id, peer in pending:
+                # Unresolvable sources get the raw peer, as with inline lookups
+                forward_from = _forward_name(cache.get(peer_id), peer)
+                try:
+                    stored = await callback(message_id, forward_from)
+                except Exception as e:
+                    logger.warning(f"Gave up on the forward source of message {message_id}: {e}")
+                    continue
+                if not stored:
+                    logger.warning(f"Gave up on the forward source of message {message_id}: it is not stored")
+    
     async def disconnect(self):
         """Disconnect the Telegram client."""
+        for worker in self._event_workers:
+            worker.cancel()
+        self._event_workers = []
+        if self._convert_pool:
+            self._convert_pool.shutdown(wait=False)
+            self._convert_pool = None
+        if self._forward_task:
+            self._forward_task.cancel()
+            self._forward_task = None
+            self._forward_queue = None
+            self._pending_forwards.clear()
         if self.client:
             await self.client.disconnect()
             logger.info("Telegram client disconnected")
@@ -50,21 +316,25 @@ class TelegramClientWrapper:
     async def get_current_high_water_mark(self) -> HighWaterMark:
         """Get the current high water mark (latest message) for the target chat."""
         try:
+            now = datetime.now(UTC)
+            
             # Get the latest message
-            async for message in self.client.iter_messages(self.target_chat_id, limit=1):
+            latest = await self.client.get_messages(self.target_chat_id, limit=1)
+            if latest:
+                message = latest[0]
                 return HighWaterMark(
                     chat_id=self.target_chat_id,
                     message_id=message.id,
-                    ts_utc=message.date.replace(tzinfo=timezone.utc),
-                    created_at=datetime.utcnow().replace(tzinfo=timezone.utc)
+                    ts_utc=_ensure_utc(message.date),
+                    created_at=now
                 )
             
             # If no messages found, return a default
             return HighWaterMark(
                 chat_id=self.target_chat_id,
                 message_id=0,
-                ts_utc=datetime.utcnow().replace(tzinfo=timezone.utc),
-                created_at=datetime.utcnow().replace(tzinfo=timezone.utc)
+                ts_utc=now,
+                created_at=now
             )
             
         except Exception as e:
@@ -86,37 +356,119 @@ class TelegramClientWrapper:
         Returns:
             List of TelegramMessage objects in ascending order by message_id
         """
-        messages = []
-        
         try:
-            # Apply rate limiting
-            await asyncio.sleep(self._rate_limit_delay)
-            
-            # Fetch messages
-            async for message in self.client.iter_messages(
-                self.target_chat_id,
-                min_id=min_id,
-                max_id=max_id,
-                limit=limit,
-                reverse=True  # Get in ascending order
-            ):
-                if isinstance(message, Message) and message.message:
-                    tg_msg = await self._convert_message(message)
-                    messages.append(tg_msg)
-            
+            messages = [m async for m in self._iter_messages_batch(min_id, max_id, limit)]
             logger.debug(f"Fetched {len(messages)} messages (min_id={min_id}, max_id={max_id})")
             return messages
-            
-        except FloodWaitError as e:
-            logger.warning(f"Rate limited, waiting {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-            # Retry once after flood wait
-            return await self.fetch_messages_batch(min_id, max_id, limit)
-            
+        
         except Exception as e:
             logger.error(f"Error fetching messages: {e}")
             raise
     
+    async def _iter_messages_batch(self,
+                                   min_id: int = 0,
+                                   max_id: Optional[int] = None,
+                                   limit: int = 100,
+                                   chunk_size: int = 100) -> AsyncGenerator[TelegramMessage, None]:
+        """Yield the messages fetch_messages_batch returns as they are converted."""
+        async with aclosing(self._iter_raw_chunks(
+            chunk_size, limit=limit, min_id=min_id, max_id=max_id
+        )) as chunks:
+            async for chunk in chunks:
+                for tg_msg in await self._convert_batch(chunk):
+                    yield tg_msg
+
+    async def stream_messages(self,
+                              min_id: int,
+                              max_id: int,
+                              batch_size: int = 100,
+                              prefetch: int = 2) -> AsyncGenerator[List[TelegramMessage], None]:
+        """
+        Yield batches of messages with IDs in (min_id, max_id], fetching ahead.
+        
+        A background task keeps up to `prefetch` batches waiting so the next
+        fetch overlaps with the caller's processing of the current batch.
+        
+        Args:
+            min_id: Minimum message ID (exclusive)
+            max_id: Maximum message ID (inclusive)
+            batch_size: Maximum number of messages per batch
+            prefetch: Number of batches fetched ahead of the caller
+            
+        Yields:
+            Non-empty lists of TelegramMessage objects in ascending order
+            
+        Raises:
+            The error that stopped the scan after repeated failed attempts
+        """
+        queue = asyncio.Queue(maxsize=prefetch)
+        producer = asyncio.create_task(self._prefetch_worker(queue, min_id, max_id, batch_size))
+        
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+    
+    async def _prefetch_worker(self, queue: asyncio.Queue, min_id: int, max_id: int, batch_size: int):
+        """Scan the range into the queue, ending with None or the error that stopped it."""
+        cursor = MessageCursor(message_id=min_id)
+        attempt = 0
+        while True:
+            try:
+                async with aclosing(self.iter_since(cursor, batch_size, max_id)) as pages:
+                    async for page in pages:
+                        await queue.put(page)
+                        attempt = 0  # Only consecutive failures count
+                break
+            except Exception as e:
+                attempt += 1
+                logger.error(f"Error prefetching messages after {cursor.message_id} "
+                             f"(attempt {attempt}/{_PREFETCH_ATTEMPTS}): {e}")
+                if attempt >= _PREFETCH_ATTEMPTS:
+                    await queue.put(e)
+                    return
+                await asyncio.sleep(5)
+        await queue.put(None)
+    
+    async def iter_since(self,
+                         cursor: MessageCursor,
+                         page_size: int = 100,
+                         max_id: Optional[int] = None) -> AsyncGenerator[List[TelegramMessage], None]:
+        """
+        Yield pages of messages after `cursor` from one continuous scan.
+        
+        The cursor is moved to the last message of each page as it is
+        yielded, so after an interruption the same cursor resumes without
+        repeating or skipping messages.
+        
+        Args:
+            cursor: Scan position; message_id is the exclusive lower bound
+            page_size: Maximum number of messages per page
+            max_id: Maximum message ID (inclusive), None for latest
+        
+        Yields:
+            Non-empty lists of TelegramMessage objects in ascending order
+        """
+        # iter_messages excludes max_id itself, so ask for one past it
+        async with aclosing(self._iter_raw_chunks(
+            page_size, min_id=cursor.message_id, max_id=max_id + 1 if max_id else 0
+        )) as chunks:
+            async for chunk in chunks:
+                page = await self._convert_batch(chunk)
+                cursor.message_id = page[-1].message_id
+                cursor.ts_utc = page[-1].ts_utc
+                yield page
+    
     async def fetch_messages_in_range(self,
                                     start_date: datetime,
                                     end_date: datetime,
@@ -132,135 +484,286 @@ class TelegramClientWrapper:
         Returns:
             List of TelegramMessage objects
         """
-        messages = []
-        
         try:
-            await asyncio.sleep(self._rate_limit_delay)
-            
-            async for message in self.client.iter_messages(
-                self.target_chat_id,
-                offset_date=end_date,
-                reverse=True,
-                limit=limit
-            ):
-                if isinstance(message, Message) and message.message:
-                    # Check if message is within date range
-                    msg_date = message.date.replace(tzinfo=timezone.utc)
-                    if msg_date < start_date:
-                        break
-                    if msg_date <= end_date:
-                        tg_msg = await self._convert_message(message)
-                        messages.append(tg_msg)
-            
+            messages = [m async for m in self._iter_messages_in_range(start_date, end_date, limit)]
             logger.debug(f"Fetched {len(messages)} messages in date range {start_date} to {end_date}")
             return messages
-            
-        except FloodWaitError as e:
-            logger.warning(f"Rate limited, waiting {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-            return await self.fetch_messages_in_range(start_date, end_date, limit)
-            
+        
         except Exception as e:
             logger.error(f"Error fetching messages in range: {e}")
             raise
     
-    async def _convert_message(self, message: Message) -> TelegramMessage:
-        """Convert a Telethon Message to our TelegramMessage model."""
-        # Extract URLs from message text
-        urls = []
-        if message.entities:
-            for entity in message.entities:
-                if hasattr(entity, 'url') and entity.url:
-                    urls.append(entity.url)
+    async def _iter_messages_in_range(self,
+                                      start_date: datetime,
+                                      end_date: datetime,
+                                      limit: Optional[int] = None,
+                                      chunk_size: int = 100) -> AsyncGenerator[TelegramMessage, None]:
+        """Yield the messages fetch_messages_in_range returns as they are converted."""
+        # The newest message before start_date bounds the scan, so it starts
+        # at the range instead of walking in from one end of the chat
+        boundary = await self._with_flood_retry(
+            lambda: self.client.get_messages(self.target_chat_id, offset_date=start_date, limit=1)
+        )
+        min_id = boundary[0].id if boundary else 0
+        
+        async with aclosing(self._iter_raw_chunks(
+            chunk_size, limit=limit, min_id=min_id
+        )) as chunks:
+            async for chunk in chunks:
+                in_range = []
+                past_range = False
+                for message in chunk:
+                    # Messages arrive in ascending order, so stop at the first one past the range
+                    if _ensure_utc(message.date) > end_date:
+                        past_range = True
+                        break
+                    in_range.append(message)
+                
+                for tg_msg in await self._convert_batch(in_range):
+                    yield tg_msg
+                if past_range:
+                    return
+    
+    async def _iter_raw_chunks(self,
+                               chunk_size: int,
+                               limit: Optional[int] = None,
+                               min_id: int = 0,
+                               **kwargs) -> AsyncGenerator[List[Message], None]:
+        """
+        Yield text messages from iter_messages in ascending chunks of chunk_size.
+        
+        Each history request Telegram serves takes a token from the bucket.
+        A flood wait mid-scan resumes after the last chunk already yielded,
+        so callers never see a message twice.
+        """
+        client = self.client
+        chat = self.target_chat_id
+        bucket = self._bucket
+        while True:
+            await bucket.acquire()
+            chunk = []
+            scanned = 0
+            paged = 0
+            try:
+                async for message in client.iter_messages(
+                    chat,
+                    limit=limit,
+                    min_id=min_id,
+                    reverse=True,  # Get in ascending order
+                    **kwargs
+                ):
+                    scanned += 1
+                    # Service and empty messages carry no text (message is None)
+                    if message.message:
+                        chunk.append(message)
+                        if len(chunk) >= chunk_size:
+                            min_id = message.id
+                            if limit is not None:
+                                limit -= scanned
+                            scanned = 0
+                            ready, chunk = chunk, []
+                            yield ready
+                    paged += 1
+                    if paged % _HISTORY_PAGE_SIZE == 0:
+                        # The next message comes from a new request
+                        await bucket.acquire()
+            except FloodWaitError as e:
+                self._record_flood(e)
+                continue
+            
+            self._record_success()
+            if chunk:
+                yield chunk
+            return
+    
+    async def _convert_batch(self,
+                             messages: List[Message],
+                             lookup: bool = True,
+                             defer: bool = True) -> List[TelegramMessage]:
+        """
+        Convert raw messages, resolving their senders together.
         
-        # Get sender information
-        from_user_id = None
-        from_username = None
-        if message.sender_id:
-            from_user_id = message.sender_id
+        Large batches are converted on the conversion threads so the event
+        loop can keep serving Telegram traffic meanwhile.
+        """
+        entities = await self._resolve_entities(messages, lookup, defer)
+        if self._convert_pool is None or len(messages) < _CONVERT_OFFLOAD_MIN:
+            return _convert_batch_sync(messages, entities, self.target_chat_id)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._convert_pool, _convert_batch_sync, messages, entities, self.target_chat_id
+        )
+
+    async def _with_flood_retry(self, request):
+        """
+        Await `request()` once the token bucket allows it, retrying on FloodWaitError.
+        
+        A flood wait pauses the bucket for the requested time and raises its
+        interval, so a sustained backlog settles below Telegram's limit
+        instead of repeatedly hitting it. The interval decays back to the
+        configured rate limit delay after a run of successful requests.
+        """
+        while True:
+            await self._bucket.acquire()
             try:
-                sender = await message.get_sender()
-                if isinstance(sender, User) and sender.username:
-                    from_username = sender.username
-            except Exception:
-                pass  # Ignore errors getting sender info
+                result = await request()
+            except FloodWaitError as e:
+                self._record_flood(e)
+                continue
+            
+            self._record_success()
+            return result
+    
+    def _record_flood(self, error: FloodWaitError):
+        """Pause the token bucket for a flood wait and slow later requests."""
+        bucket = self._bucket
+        bucket.interval = min(max(bucket.interval * 1.5, 1.0), _MAX_REQUEST_DELAY)
+        bucket.pause(error.seconds)
+        self._requests_since_flood = 0
+        logger.warning(f"Rate limited, waiting {error.seconds} seconds "
+                       f"(request delay now {bucket.interval:.1f}s)")
+    
+    def _record_success(self):
+        """Relax the request delay after a run of requests without a flood."""
+        bucket = self._bucket
+        self._requests_since_flood += 1
+        if (self._requests_since_flood >= _DELAY_RELAX_AFTER
+                and bucket.interval > self._rate_limit_delay):
+            bucket.interval = max(bucket.interval / 1.5, self._rate_limit_delay)
+            self._requests_since_flood = 0
+    
+    async def _resolve_entities(self,
+                                messages: List[Message],
+                                lookup: bool = True,
+                                defer: bool = True) -> dict:
+        """
+        Resolve the senders and forward sources of a batch of messages.
         
-        # Handle forwarded messages
-        is_forwarded = message.forward is not None
-        forward_from = None
-        if is_forwarded and message.forward:
-            if message.forward.from_name:
-                forward_from = message.forward.from_name
-            elif message.forward.from_id:
-                try:
-                    forward_entity = await self.client.get_entity(message.forward.from_id)
-                    if hasattr(forward_entity, 'title'):
-                        forward_from = forward_entity.title
-                    elif hasattr(forward_entity, 'username'):
-                        forward_from = forward_entity.username
-                except Exception:
-                    forward_from = str(message.forward.from_id)
+        Senders Telegram already attached to the messages are used as-is;
+        everything else comes from the entity cache or a single batched
+        get_entity call, which `lookup=False` skips. While the forward
+        resolver runs, uncached forward sources are deferred to it and left
+        out of the map, unless `defer=False` asks for them inline.
+        Returns a map of peer ID to entity, with None for peers that could
+        not be resolved.
+        """
+        cache = self._entity_cache
+        deferred = defer and self._forward_queue is not None
+        resolved = {}
+        missing = {}
         
-        # Extract username from first line of message text
-        message_text = message.message or ""
-        extracted_username = None
-        actual_text = message_text
+        for message in messages:
+            sender_id = message.sender_id
+            if sender_id:
+                sender = message.sender
+                if sender is not None and not getattr(sender, 'min', False):
+                    resolved[sender_id] = sender
+                else:
+                    missing[sender_id] = message.input_sender or sender_id
+            forward = message.forward
+            if forward and not forward.from_name and forward.from_id:
+                peer_id = utils.get_peer_id(forward.from_id)
+                if deferred and peer_id not in cache:
+                    self._defer_forward(message.id, peer_id, forward.from_id)
+                else:
+                    missing[peer_id] = forward.from_id
         
-        if message_text.strip():
-            lines = message_text.strip().split('\n')
-            if len(lines) > 1:
-                # First line is likely the username, rest is the actual message
-                first_line = lines[0].strip()
-                # Simple heuristic: if first line is short and doesn't contain common message words
-                if (len(first_line) <= 50 and 
-                    not any(word in first_line.lower() for word in ['http', 'www', '$', 'the ', 'and ', 'this ', 'that ']) and
-                    len(first_line.split()) <= 3):
-                    extracted_username = first_line
-                    actual_text = '\n'.join(lines[1:]).strip()
+        for peer_id in list(missing):
+            if peer_id in resolved:
+                del missing[peer_id]
+            elif peer_id in cache:
+                cache.move_to_end(peer_id)
+                resolved[peer_id] = cache[peer_id]
+                del missing[peer_id]
         
-        # Use extracted username if available, otherwise fall back to API username
-        final_username = extracted_username or from_username
+        if missing and lookup:
+            resolved.update(await self._lookup_entities(missing))
         
-        return TelegramMessage(
-            chat_id=self.target_chat_id,
-            message_id=message.id,
-            ts_utc=message.date.replace(tzinfo=timezone.utc),
-            from_user_id=from_user_id,
-            from_username=final_username,
-            is_forwarded=is_forwarded,
-            forward_from=forward_from,
-            text=actual_text,
-            urls=urls,
-            reply_to_id=message.reply_to_msg_id,
-            edit_date=message.edit_date.replace(tzinfo=timezone.utc) if message.edit_date else None
-        )
+        self._cache_entities(resolved)
+        return resolved
     
-    def add_message_handler(self, handler_func):
-        """Add a handler for new incoming messages."""
+    async def _lookup_entities(self, peers: dict) -> dict:
+        """Fetch peer ID -> entity for `peers`, with one get_entity call where possible."""
+        try:
+            fetched = await self.client.get_entity(list(peers.values()))
+            return dict(zip(peers, fetched))
+        except Exception:
+            # One unresolvable peer fails the whole call, so fall back to
+            # looking them up one at a time
+            found = {}
+            for peer_id, peer in peers.items():
+                try:
+                    found[peer_id] = await self.client.get_entity(peer)
+                except Exception:
+                    found[peer_id] = None  # Ignore errors getting entity info
+            return found
+    
+    def _cache_entities(self, entities: dict):
+        """Store resolved entities in the LRU entity cache."""
+        cache = self._entity_cache
+        for peer_id, entity in entities.items():
+            if entity is not None:
+                cache[peer_id] = entity
+                cache.move_to_end(peer_id)
+        while len(cache) > _ENTITY_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    async def _convert_message(self, message: Message, lookup: bool = True) -> TelegramMessage:
+        """Convert a Telethon Message to our TelegramMessage model."""
+        return (await self._convert_batch([message], lookup))[0]
+    
+    def add_message_handler(self, handler_func, lean: bool = False):
+        """
+        Add a handler for new incoming messages.
+        
+        With `lean`, messages are converted without any entity lookups:
+        senders not attached to the update or cached have no username, and
+        forward sources are left to the forward resolver.
+        """
         @self.client.on(events.NewMessage(chats=self.target_chat_id))
         async def message_handler(event):
-            try:
-                if event.message and event.message.message:
-                    tg_msg = await self._convert_message(event.message)
-                    await handler_func(tg_msg)
-            except Exception as e:
-                logger.error(f"Error in message handler: {e}")
+            if event.message and event.message.message:
+                await self._enqueue_event(event.message, handler_func, lean)
         
         logger.info("Message handler added for live updates")
     
-    def add_message_edit_handler(self, handler_func):
-        """Add a handler for message edits."""
+    def add_message_edit_handler(self, handler_func, lean: bool = False):
+        """Add a handler for message edits; `lean` as for add_message_handler."""
         @self.client.on(events.MessageEdited(chats=self.target_chat_id))
         async def edit_handler(event):
-            try:
-                if event.message and event.message.message:
-                    tg_msg = await self._convert_message(event.message)
-                    await handler_func(tg_msg)
-            except Exception as e:
-                logger.error(f"Error in edit handler: {e}")
+            if event.message and event.message.message:
+                await self._enqueue_event(event.message, handler_func, lean)
         
         logger.info("Message edit handler added")
     
+    async def _enqueue_event(self, message: Message, handler_func, lean: bool):
+        """
+        Queue a live message for the handler workers, dropping it if they stay backed up.
+        
+        Updates are sharded by message ID, so a message and its edits are
+        handled by the same worker in the order they arrived.
+        """
+        queue = self._event_queues[message.id % len(self._event_queues)]
+        try:
+            await asyncio.wait_for(
+                queue.put((message, handler_func, lean)), _EVENT_PUT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            # The overlap re-scan picks the message up later
+            logger.warning(f"Live update queue full, dropped message {message.id}")
+    
+    async def _event_worker(self, queue: asyncio.Queue):
+        """Convert queued live messages and run their handlers."""
+        while True:
+            message, handler_func, lean = await queue.get()
+            try:
+                tg_msg = await self._convert_message(message, lookup=not lean)
+                await handler_func(tg_msg)
+            except Exception as e:
+                logger.error(f"Error in live handler for message {message.id}: {e}")
+            finally:
+                queue.task_done()
+    
     async def start_listening(self):
         """Start listening for live messages (blocking)."""
         logger.info("Starting live message listener...")
@@ -269,17 +772,44 @@ class TelegramClientWrapper:
     async def get_message_by_id(self, message_id: int) -> Optional[TelegramMessage]:
         """Get a specific message by ID."""
         try:
-            await asyncio.sleep(self._rate_limit_delay)
-            
-            message = await self.client.get_messages(self.target_chat_id, ids=message_id)
-            if message and isinstance(message, Message) and message.message:
-                return await self._convert_message(message)
+            message = await self._with_flood_retry(
+                lambda: self.client.get_messages(self.target_chat_id, ids=message_id)
+            )
+            if message and message.message:
+                # Callers don't store these rows through ingest, so forward
+                # sources are resolved inline instead of deferred
+                return (await self._convert_batch([message], defer=False))[0]
             return None
             
         except Exception as e:
             logger.error(f"Error getting message {message_id}: {e}")
             return None
     
+    async def get_messages_by_ids(self, message_ids: List[int]) -> List[Optional[TelegramMessage]]:
+        """
+        Get many messages by ID, 100 per request.
+        
+        Returns one entry per ID in the same order, None where the message
+        is missing, has no text or could not be fetched. Forward sources are
+        resolved inline, as in get_message_by_id.
+        """
+        results: List[Optional[TelegramMessage]] = []
+        for start in range(0, len(message_ids), _HISTORY_PAGE_SIZE):
+            ids = message_ids[start:start + _HISTORY_PAGE_SIZE]
+            try:
+                messages = await self._with_flood_retry(
+                    lambda: self.client.get_messages(self.target_chat_id, ids=ids)
+                )
+                found = [m for m in messages if m and m.message]
+                converted = dict(zip(
+                    (m.id for m in found), await self._convert_batch(found, defer=False)
+                ))
+                results.extend(converted.get(message_id) for message_id in ids)
+            except Exception as e:
+                logger.error(f"Error getting messages {ids[0]}-{ids[-1]}: {e}")
+                results.extend([None] * len(ids))
+        return results
+    
     async def validate_chat_access(self) -> Tuple[bool, str]:
         """
         Validate that we can access the target chat.
@@ -291,8 +821,7 @@ class TelegramClientWrapper:
             entity = await self.client.get_entity(self.target_chat_id)
             
             # Try to get at least one message to verify read access
-            async for message in self.client.iter_messages(entity, limit=1):
-                break
+            await self.client.get_messages(entity, limit=1)
             
             chat_title = getattr(entity, 'title', 'Unknown')
             return True, f"Successfully connected to: {chat_title}"